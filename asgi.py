@@ -0,0 +1,320 @@
+﻿# asgi.py
+# Асинхронний режим сервера: uvicorn asgi:app або python asgi.py (pip install uvicorn).
+# Запити обробляються тими самими обробниками Flask з server.py, але виконуються
+# в обмеженому пулі потоків, а довге опитування чату (GET /chat/messages з wait)
+# чекає на нове повідомлення в циклі подій, не займаючи потік, тому тисячі
+# клієнтів, що чекають, майже нічого не коштують. Решта запитів передається
+# потоково в обидва боки, тому імпорт та експорт каталогу не накопичуються в пам'яті.
+import asyncio
+import io
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode
+
+import jwt
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+from wsgi import HOST, PORT, THREADS, SHUTDOWN_TIMEOUT
+from server import app as flask_app, CHAT_MAX_WAIT, CHAT_RECHECK_INTERVAL
+from events import chat_notifier, CHAT_NOTIFIER_MAX_CLIENTS
+from db import pool
+from compression import decompress
+
+# Пул потоків для роботи з базою даних (не більший за пул з'єднань)
+executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='db')
+
+# Кількість частин потокової відповіді, що очікують на відправлення
+STREAM_QUEUE_SIZE = 4
+
+
+# Очікування нових повідомлень у циклі подій. Лічильник сповіщень кожної розмови
+# дозволяє не пропустити повідомлення, збережене між запитом до бази та очікуванням.
+class ChatWaiters:
+    def __init__(self):
+        self._waiters = {}
+        # Версії лише для CHAT_NOTIFIER_MAX_CLIENTS останніх розмов; номери спільні для всіх
+        # розмов, тому витіснена і знову додана розмова не повторить версію, яку вже бачили
+        self._versions = OrderedDict()
+        self._counter = itertools.count(1)
+
+    def version(self, client_id):
+        return self._versions.get(client_id, 0)
+
+    def notify(self, client_id):
+        self._versions[client_id] = next(self._counter)
+        self._versions.move_to_end(client_id)
+        if len(self._versions) > CHAT_NOTIFIER_MAX_CLIENTS:
+            self._versions.popitem(last=False)
+        for future in self._waiters.pop(client_id, ()):
+            if not future.done():
+                future.set_result(None)
+
+    async def wait(self, client_id, seen_version, timeout):
+        if self.version(client_id) != seen_version:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client_id, set()).add(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(client_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self._waiters[client_id]
+
+
+chat_waiters = ChatWaiters()
+
+
+# Середовище WSGI запиту: тіло - готові байти body або потік input_stream
+def build_environ(scope, query_string, headers, body=b'', input_stream=None):
+    builder = EnvironBuilder(
+        path=scope['path'],
+        method=scope['method'],
+        query_string=query_string,
+        headers=headers,
+        data=body,
+        base_url=f"{scope.get('scheme', 'http')}://{dict(headers).get('Host', f'{HOST}:{PORT}')}",
+    )
+    environ = builder.get_environ()
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    # EnvironBuilder визначає довжину потоку перемотуванням, тому потік підставляється після нього;
+    # тіло без Content-Length (chunked) читається до кінця потоку
+    if input_stream is not None:
+        environ['wsgi.input'] = input_stream
+        content_length = dict(headers).get('Content-Length')
+        if content_length is not None:
+            environ['CONTENT_LENGTH'] = content_length
+        else:
+            environ.pop('CONTENT_LENGTH', None)
+            environ['wsgi.input_terminated'] = True
+    return environ
+
+
+# Тіло запиту для обробника Flask: частини беруться з receive циклу подій на вимогу
+class RequestBody(io.RawIOBase):
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = b''
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            self._buffer = message.get('body', b'')
+            self._more = message.get('more_body', False)
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+# Виконання запиту обробниками Flask у пулі потоків; повертає (статус, заголовки, тіло)
+async def dispatch(scope, query_string, headers, body):
+    environ = build_environ(scope, query_string, headers, body)
+
+    def run():
+        app_iter, status, response_headers = run_wsgi_app(flask_app, environ, buffered=True)
+        try:
+            return int(status.split(' ', 1)[0]), list(response_headers.items()), b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+    return await asyncio.get_running_loop().run_in_executor(executor, run)
+
+
+# Розмова, на яку чекає запит: клієнт - власна, менеджер - client_id з параметрів.
+# Права доступу все одно перевіряє обробник Flask під час кожного запиту.
+def chat_conversation(headers, args):
+    auth_header = dict(headers).get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        data = jwt.decode(auth_header.split(' ')[1], flask_app.config['SECRET_KEY'], algorithms=["HS256"])
+        if data.get('role') == 'client':
+            return data['user_id']
+        return int(args['client_id'])
+    except Exception:
+        return None
+
+
+# Відповідь обробника вже може бути стиснена (after_request у server.py)
+def has_messages(response):
+    status, headers, body = response
+    if status != 200:
+        return True
+    encoding = dict(headers).get('Content-Encoding')
+    return bool(json.loads(decompress(body, encoding)).get('messages'))
+
+
+# Довге опитування чату: запит до бази без wait, за відсутності повідомлень -
+# очікування сповіщення (або CHAT_RECHECK_INTERVAL для змін з інших процесів) та повтор
+async def chat_long_poll(scope, params, headers, body):
+    args = dict(params)
+    try:
+        wait = min(max(float(args.get('wait', 0)), 0), CHAT_MAX_WAIT)
+    except ValueError:
+        wait = 0
+    query_string = urlencode([(name, value) for name, value in params if name != 'wait'])
+    conversation_id = chat_conversation(headers, args)
+
+    seen_version = chat_waiters.version(conversation_id)
+    response = await dispatch(scope, query_string, headers, body)
+    if not wait or 'since_id' not in args or conversation_id is None or has_messages(response):
+        return response
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return response
+        await chat_waiters.wait(conversation_id, seen_version, min(remaining, CHAT_RECHECK_INTERVAL))
+        seen_version = chat_waiters.version(conversation_id)
+        response = await dispatch(scope, query_string, headers, body)
+        if has_messages(response):
+            return response
+
+
+# Потокове виконання запиту. Обробник і його відповідь виконуються в одному потоці
+# пулу (з'єднання з базою, яке тримає експорт, не переходить між потоками), а частини
+# відповіді передаються в цикл подій через чергу; семафор обмежує кількість
+# невідправлених частин, не змушуючи потік чекати на цикл подій після кожної.
+async def stream(scope, receive, send, headers):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    slots = threading.Semaphore(STREAM_QUEUE_SIZE)
+    cancelled = threading.Event()
+    environ = build_environ(scope, scope['query_string'].decode('latin-1'), headers,
+                            input_stream=io.BufferedReader(RequestBody(receive, loop)))
+
+    def put(item):
+        slots.acquire()
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    async def get():
+        item = await queue.get()
+        slots.release()
+        return item
+
+    def run():
+        try:
+            app_iter, status, response_headers = run_wsgi_app(flask_app, environ)
+            try:
+                put((int(status.split(' ', 1)[0]), list(response_headers.items())))
+                for chunk in app_iter:
+                    if cancelled.is_set():
+                        break
+                    if chunk:
+                        put(chunk)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        finally:
+            put(None)
+
+    # Відключення клієнта зупиняє обробник (uvicorn не повідомляє про нього через send).
+    # Стежити можна лише після початку відповіді, коли обробник уже прочитав тіло запиту
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        cancelled.set()
+
+    task = loop.run_in_executor(executor, run)
+    watcher = None
+    finished = False
+    try:
+        start = await get()
+        if start is None:
+            finished = True
+            return
+        watcher = asyncio.ensure_future(watch_disconnect())
+        status, response_headers = start
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers],
+        })
+        while True:
+            chunk = await get()
+            if chunk is None:
+                finished = True
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        # Відправлення не вдалося (клієнт відключився): обробник зупиняється,
+        # а черга розвантажується, щоб потік пулу не чекав на неї
+        if not finished:
+            cancelled.set()
+            while await get() is not None:
+                pass
+        if watcher is not None:
+            watcher.cancel()
+        await task
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Сповіщення з потоків пулу передаються в цикл подій
+            loop = asyncio.get_running_loop()
+            chat_notifier.add_listener(
+                lambda client_id, message_id: loop.call_soon_threadsafe(chat_waiters.notify, client_id))
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=True)
+            pool.close_all()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    headers = [(name.decode('latin-1').title(), value.decode('latin-1')) for name, value in scope['headers']]
+
+    if scope['method'] != 'GET' or scope['path'] != '/chat/messages':
+        return await stream(scope, receive, send, headers)
+
+    # Довге опитування може виконати запит кілька разів, тому тіло читається повністю
+    body = await read_body(receive)
+    params = parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+    status, response_headers, response_body = await chat_long_poll(scope, params, headers, body)
+
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers],
+    })
+    await send({'type': 'http.response.body', 'body': response_body})
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host=HOST, port=PORT, timeout_graceful_shutdown=int(SHUTDOWN_TIMEOUT))
@@ -0,0 +1,2 @@
+﻿# benchmarks/__init__.py
+# Бенчмарки продуктивності. Запуск з кореня проекту: python -m benchmarks.<назва>
@@ -0,0 +1,66 @@
+﻿# benchmarks/bulk_import.py
+# Оновлення каталогу: окремі запити POST /products проти одного POST /products/import
+# (CSV) та потоковий експорт GET /products/export.
+#   python -m benchmarks.bulk_import [рядків] [окремих запитів для оцінки]
+import csv
+import io
+import sys
+import time
+
+import db
+from benchmarks.common import fresh_database, populate_catalog
+
+ROWS = 50000
+SINGLE_SAMPLE = 500
+
+
+def run(rows=ROWS, single_sample=SINGLE_SAMPLE):
+    fresh_database('bulk.db')
+    import server
+    with db.get_db() as conn:
+        populate_catalog(conn, 0)
+        conn.execute("INSERT INTO users (username, password, email, role) VALUES ('manager', ?, 'manager@example.com', 'manager')",
+                     (server.hash_password("password"),))
+        conn.commit()
+
+    client = server.app.test_client()
+    token = client.post('/login', json={"username": "manager", "password": "password"}).get_json()['token']
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Окремі запити: час вимірюється на вибірці та перераховується на всі рядки
+    started = time.perf_counter()
+    for i in range(single_sample):
+        response = client.post('/products', json={"name": f"Товар {i}", "price": 10 + i % 500, "quantity": 1 + i % 50,
+                                                   "category_id": 1 + i % 10}, headers=headers)
+        assert response.status_code == 201
+    single_ms = (time.perf_counter() - started) / single_sample * 1000
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["name", "description", "price", "quantity", "category_id"])
+    writer.writerows([f"Імпорт {i}", "Опис", 10 + i % 500, i % 50, 1 + i % 10] for i in range(rows))
+    body = buffer.getvalue().encode()
+
+    started = time.perf_counter()
+    result = client.post('/products/import', data=body, headers={**headers, "Content-Type": "text/csv"}).get_json()
+    insert_s = time.perf_counter() - started
+    assert result['inserted'] == rows, result
+
+    started = time.perf_counter()
+    exported = client.get('/products/export', headers=headers).data
+    export_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = client.post('/products/import', data=exported, headers={**headers, "Content-Type": "text/csv"}).get_json()
+    update_s = time.perf_counter() - started
+    assert result['error_count'] == 0, result
+
+    print(f"рядків: {rows}")
+    print(f"POST /products по одному: {single_ms:.2f} мс на товар, оцінка для {rows}: {single_ms * rows / 1000:.1f} с")
+    print(f"POST /products/import (нові товари): {insert_s:.2f} с")
+    print(f"GET /products/export: {export_s:.2f} с, {len(exported) // 1024} КБ")
+    print(f"POST /products/import (оновлення {result['updated']} товарів): {update_s:.2f} с")
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
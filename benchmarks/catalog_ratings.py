@@ -0,0 +1,74 @@
+﻿# benchmarks/catalog_ratings.py
+# Порівняння старого підходу N+1 (окремий запит рейтингу на кожен товар)
+# з поточним GET /products залежно від розміру каталогу. Обидва варіанти читають
+# увесь каталог: GET /products - сторінками по PAGE_SIZE за next_cursor, з вимкненим
+# кешем відповідей, щоб кожна сторінка виконувала запити до бази даних; старий
+# варіант так само кодує результат у JSON і розбирає його, як це робить клієнт.
+import json
+import sqlite3
+import sys
+
+import db
+from benchmarks.common import fresh_database, populate_catalog, QueryCounter, measure
+
+SIZES = [100, 1000, 5000]
+PAGE_SIZE = 200
+
+
+# Старий варіант: список товарів, потім AVG/COUNT для кожного товару
+def legacy_products(conn):
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("SELECT p.*, c.name as category_name FROM products p LEFT JOIN categories c ON p.category_id = c.id ORDER BY p.name asc")
+    products = [dict(row) for row in cursor.fetchall()]
+    for product in products:
+        cursor.execute("SELECT AVG(rating) as avg_rating, COUNT(id) as reviews_count FROM reviews WHERE product_id = ?",
+                       (product['id'],))
+        rating_data = cursor.fetchone()
+        product['avg_rating'] = rating_data['avg_rating'] if rating_data['avg_rating'] else 0
+        product['reviews_count'] = rating_data['reviews_count']
+    return products
+
+
+# Поточний варіант: усі сторінки GET /products без кешу відповідей
+def fetch_catalog(server, client):
+    products = []
+    cursor = None
+    while True:
+        server.response_cache.clear()
+        response = client.get('/products', query_string={"limit": PAGE_SIZE, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        products += response.json['products']
+        cursor = response.json['next_cursor']
+        if not cursor:
+            return products
+
+
+def run(sizes=SIZES):
+    print(f"{'товарів':>8} | {'N+1 запитів':>11} | {'N+1 мс':>8} | {'запитів':>7} | {'мс':>8}")
+    for size in sizes:
+        fresh_database()
+        with db.get_db() as conn:
+            populate_catalog(conn, size)
+
+        import server
+        client = server.app.test_client()
+
+        with db.get_db() as conn:
+            counter = QueryCounter()
+            conn.set_trace_callback(counter)
+            legacy_products(conn)
+            legacy_queries = counter.count
+            legacy_ms = measure(lambda: json.loads(server.app.json.dumps({"products": legacy_products(conn)})))
+
+            counter.count = 0
+            assert len(fetch_catalog(server, client)) == size
+            queries = counter.count
+            conn.set_trace_callback(None)
+
+        current_ms = measure(lambda: fetch_catalog(server, client))
+        print(f"{size:>8} | {legacy_queries:>11} | {legacy_ms:>8.1f} | {queries:>7} | {current_ms:>8.1f}")
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[1:]] or SIZES)
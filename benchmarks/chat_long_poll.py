@@ -0,0 +1,150 @@
+﻿# benchmarks/chat_long_poll.py
+# Довге опитування чату через asgi.py: клієнти чекають на нові повідомлення
+# (GET /chat/messages?since_id=...&wait=...), менеджер надсилає їм повідомлення,
+# вимірюється затримка від відправлення до відповіді опитування. Перше опитування
+# кожного клієнта (since_id=0, історія більша за COMPRESSION_MIN_SIZE) повертається
+# стисненим, як для клієнта на requests, тому перевіряється і цей шлях.
+# Код виходу 1, якщо були помилки або не доставлені повідомлення.
+#   python -m benchmarks.chat_long_poll [клієнтів] [повідомлень]
+import datetime
+import gzip
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+
+import jwt
+
+import db
+from benchmarks.common import fresh_database, start_server, stop_server, percentile
+
+CLIENTS = 200
+MESSAGES = 500
+HISTORY = 20
+SEND_INTERVAL = 0.01
+WAIT = 5
+PORT = 5096
+SECRET_KEY = "benchmark-chat-long-poll-secret-key"
+
+
+def populate_chat(conn, clients_count):
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO users (username, password, email, role) VALUES ('manager', '', 'manager@example.com', 'manager')")
+    cursor.executemany("INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)",
+                       [(f"client{i}", "", f"client{i}@example.com", "client") for i in range(1, clients_count + 1)])
+    cursor.executemany(
+        "INSERT INTO chat_messages (user_id, manager_id, sender_role, message, is_read) VALUES (?, ?, ?, ?, 1)",
+        [(user_id, 1, "manager", f"Повідомлення {index} з історії розмови для перевірки розміру відповіді")
+         for user_id in range(2, clients_count + 2) for index in range(HISTORY)]
+    )
+    conn.commit()
+
+
+def token(user_id, role):
+    return jwt.encode({"user_id": user_id, "username": f"user{user_id}", "role": role,
+                       "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+                      SECRET_KEY, algorithm="HS256")
+
+
+# Опитування з Accept-Encoding: gzip; (статус, розпакований JSON)
+def poll(connection, client_token, since_id, wait):
+    connection.request("GET", f"/chat/messages?since_id={since_id}&wait={wait}",
+                       headers={"Authorization": f"Bearer {client_token}", "Accept-Encoding": "gzip"})
+    response = connection.getresponse()
+    body = response.read()
+    if response.getheader("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return response.status, json.loads(body) if response.status == 200 else None
+
+
+def run(clients_count=CLIENTS, messages_count=MESSAGES):
+    path = fresh_database('chat.db')
+    with db.get_db() as conn:
+        populate_chat(conn, clients_count)
+    db.pool.close_all()
+
+    env = {"ROBOTICS_SHOP_DB": path, "ROBOTICS_SHOP_PORT": str(PORT), "ROBOTICS_SHOP_SECRET_KEY": SECRET_KEY}
+    process = start_server([sys.executable, "asgi.py"], PORT, env)
+
+    sent_at = {}
+    latencies = []
+    errors = [0]
+    ready = threading.Barrier(clients_count + 1)
+    stop = threading.Event()
+    lock = threading.Lock()
+
+    def receiver(user_id):
+        client_token = token(user_id, "client")
+        connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=60)
+        local = []
+        local_errors = 0
+        try:
+            # Історія розмови: стиснена відповідь без очікування
+            status, data = poll(connection, client_token, 0, WAIT)
+            if status != 200 or len(data["messages"]) != HISTORY:
+                local_errors += 1
+            since_id = data["last_id"] if data else 0
+        except (OSError, http.client.HTTPException, ValueError):
+            local_errors += 1
+            since_id = 0
+        ready.wait()
+
+        while not stop.is_set():
+            try:
+                status, data = poll(connection, client_token, since_id, WAIT)
+            except (OSError, http.client.HTTPException, ValueError):
+                local_errors += 1
+                connection.close()
+                continue
+            if status != 200:
+                local_errors += 1
+                continue
+            received = time.perf_counter()
+            for message in data["messages"]:
+                local.append((received - sent_at[int(message["message"].split()[-1])]) * 1000)
+            since_id = data["last_id"]
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=receiver, args=(user_id,)) for user_id in range(2, clients_count + 2)]
+    try:
+        for thread in threads:
+            thread.start()
+        ready.wait()
+
+        rnd = random.Random(42)
+        manager_token = token(1, "manager")
+        connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=60)
+        for index in range(messages_count):
+            sent_at[index] = time.perf_counter()
+            connection.request("POST", "/chat/messages",
+                               json.dumps({"client_id": rnd.randint(2, clients_count + 1), "message": f"Нове {index}"}),
+                               {"Authorization": f"Bearer {manager_token}", "Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 201:
+                errors[0] += 1
+            time.sleep(SEND_INTERVAL)
+        connection.close()
+
+        # Доставка останніх повідомлень, після чого опитування завершуються за WAIT секунд
+        time.sleep(1)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop_server(process)
+
+    latencies.sort()
+    print(f"клієнтів: {clients_count}, повідомлень: {messages_count}")
+    print(f"доставлено: {len(latencies)}, p50 {percentile(latencies, 0.50):.1f} мс, "
+          f"p95 {percentile(latencies, 0.95):.1f} мс, p99 {percentile(latencies, 0.99):.1f} мс, помилок: {errors[0]}")
+    return 1 if errors[0] or len(latencies) != messages_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(run(*[int(arg) for arg in sys.argv[1:]]))
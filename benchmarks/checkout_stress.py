@@ -0,0 +1,97 @@
+﻿# benchmarks/checkout_stress.py
+# Навантажувальна перевірка POST /orders: багато потоків одночасно купують
+# кілька товарів з малим залишком. Після прогону залишок кожного товару
+# має дорівнювати початковому мінус сума його позицій у замовленнях.
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+import db
+from benchmarks.common import fresh_database
+
+THREADS = 16
+ORDERS_PER_THREAD = 50
+PRODUCTS = 5
+STOCK = 40
+
+
+def prepare(threads, products, stock):
+    import server
+    with db.get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO categories (name, description) VALUES ('Категорія', '')")
+        cursor.executemany(
+            "INSERT INTO products (name, description, price, quantity, category_id, image_url) VALUES (?, '', ?, ?, 1, '')",
+            [(f"Товар {i}", 10.0 * i, stock) for i in range(1, products + 1)]
+        )
+        cursor.executemany(
+            "INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, 'client')",
+            [(f"buyer{i}", server.hash_password("password"), f"buyer{i}@example.com") for i in range(threads)]
+        )
+        conn.commit()
+
+
+def buyer(index, orders, products, results, lock, barrier):
+    import server
+    client = server.app.test_client()
+    response = client.post('/login', json={"username": f"buyer{index}", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+    rnd = random.Random(index)
+
+    barrier.wait()
+    for _ in range(orders):
+        items = [{"product_id": product_id, "quantity": rnd.randint(1, 3)}
+                 for product_id in rnd.sample(range(1, products + 1), rnd.randint(1, 3))]
+        response = client.post('/orders', json={"items": items}, headers=headers)
+        with lock:
+            results[response.status_code] += 1
+
+
+def run(threads=THREADS, orders=ORDERS_PER_THREAD, products=PRODUCTS, stock=STOCK):
+    fresh_database('checkout.db')
+    db.pool = db.ConnectionPool(db.pool.path, size=threads)
+    prepare(threads, products, stock)
+
+    results = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+    workers = [threading.Thread(target=buyer, args=(i, orders, products, results, lock, barrier)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    with db.get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT p.id, p.quantity, COALESCE(SUM(oi.quantity), 0)
+            FROM products p LEFT JOIN order_items oi ON oi.product_id = p.id
+            GROUP BY p.id ORDER BY p.id
+        """)
+        rows = cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) FROM orders")
+        orders_count = cursor.fetchone()[0]
+
+    print(f"потоків: {threads}, запитів: {threads * orders}, час: {elapsed:.2f} с")
+    print("відповіді: " + ", ".join(f"{status}: {count}" for status, count in sorted(results.items())))
+    print(f"створено замовлень: {orders_count}")
+    print(f"{'товар':>5} | {'залишок':>7} | {'продано':>7}")
+    failed = results[201] != orders_count
+    for product_id, quantity, sold in rows:
+        print(f"{product_id:>5} | {quantity:>7} | {sold:>7}")
+        if quantity < 0 or quantity + sold != stock:
+            failed = True
+
+    if failed:
+        print("ПОМИЛКА: залишки не узгоджені із замовленнями")
+        return 1
+    print("OK: перепродажу немає, залишки узгоджені")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run(*[int(arg) for arg in sys.argv[1:]]))
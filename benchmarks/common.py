@@ -0,0 +1,155 @@
+﻿# benchmarks/common.py
+import http.client
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+
+import db
+
+
+# Створення тимчасової бази даних зі схемою сервера; пул перенаправляється на неї
+def fresh_database(name='bench.db'):
+    path = os.path.join(tempfile.mkdtemp(prefix='robomag_bench_'), name)
+    db.pool.close_all()
+    db.pool = db.ConnectionPool(path)
+
+    import server
+    server.init_db()
+    return path
+
+
+# Заповнення каталогу: категорії, товари, клієнти та відгуки
+def populate_catalog(conn, products_count, reviews_per_product=5, seed=42):
+    rnd = random.Random(seed)
+    cursor = conn.cursor()
+
+    cursor.executemany("INSERT INTO categories (name, description) VALUES (?, ?)",
+                       [(f"Категорія {i}", "") for i in range(1, 11)])
+    cursor.executemany(
+        "INSERT INTO products (name, description, price, quantity, category_id, image_url) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"Товар {i}", f"Опис товару {i}", round(rnd.uniform(10, 2000), 2), rnd.randint(0, 100), rnd.randint(1, 10), "")
+         for i in range(1, products_count + 1)]
+    )
+    cursor.executemany(
+        "INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)",
+        [(f"client{i}", "", f"client{i}@example.com", "client") for i in range(1, reviews_per_product + 1)]
+    )
+    cursor.executemany(
+        "INSERT INTO reviews (user_id, product_id, rating, comment) VALUES (?, ?, ?, ?)",
+        [(user_id, product_id, rnd.randint(1, 5), "")
+         for product_id in range(1, products_count + 1)
+         for user_id in range(1, rnd.randint(0, reviews_per_product) + 1)]
+    )
+    conn.commit()
+
+
+# Підрахунок SQL-запитів, виконаних на з'єднанні
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement):
+        self.count += 1
+
+
+# Середній час виконання функції (у мілісекундах)
+def measure(func, repeat=5):
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+# Корінь репозиторію (звідси запускаються процеси сервера)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Запуск сервера в окремому процесі та очікування, поки він почне відповідати
+def start_server(command, port, env=None, timeout=30):
+    process = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **(env or {})},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Сервер завершився з кодом {process.returncode}: {' '.join(command)}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/categories')
+            connection.getresponse().read()
+            connection.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Сервер не запустився за {timeout} с: {' '.join(command)}")
+
+
+def stop_server(process, timeout=30):
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# Перцентиль відсортованого списку (найближчий ранг)
+def percentile(values, fraction):
+    if not values:
+        return 0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+# Навантаження GET-запитами: concurrency потоків з постійними з'єднаннями протягом
+# duration секунд; next_path(rnd) повертає шлях наступного запиту
+def run_load(port, next_path, concurrency, duration, seed=42):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        rnd = random.Random(seed + index)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local = []
+        local_errors = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', next_path(rnd))
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                continue
+            local.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.monotonic()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
@@ -0,0 +1,356 @@
+﻿# benchmarks/load_test.py
+# Навантажувальний тест: сервер (wsgi.py, сервер розробки Flask або gunicorn)
+# працює з базою даних, згенерованою seed.py, а віртуальні користувачі виконують
+# суміш сценаріїв - перегляд каталогу, пошук, сторінка товару, оформлення
+# замовлення, опитування чату та список замовлень менеджера. Для кожного сценарію
+# виводяться p50/p95/p99 та запитів/с; результати можна зберегти як еталон
+# і порівнювати з ним наступні запуски (код виходу 1 при погіршенні).
+#   python -m benchmarks.load_test [--concurrency N] [--duration S] [--server waitress|dev|gunicorn]
+#                                  [--orders N ...] [--db шлях] [--save-baseline ім'я] [--compare ім'я]
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import quote
+
+import seed
+from benchmarks.common import ROOT, start_server, stop_server, percentile
+
+PORT = 5098
+CONCURRENCY = 16
+DURATION = 30
+WARMUP = 3
+
+# Розмір згенерованої бази даних за замовчуванням (параметри seed.py); період даних
+# закінчується фіксованою датою seed.DEFAULT_END_DATE, тому база однакова в будь-який день
+DATASET = {"users": 10000, "products": 5000, "orders": 200000, "reviews": 50000, "messages": 20000}
+
+BASELINES_DIR = os.path.join(ROOT, 'benchmarks', 'baselines')
+# Допустиме погіршення p95 та пропускної здатності відносно еталону
+REGRESSION_THRESHOLD = 0.2
+
+SEARCH_TERMS = ["arduino", "датчик", "сервопривод", "raspberry", "акумулятор", "esp32",
+                "двигун", "модуль", "набір", "паяльна"]
+SORTS = ["name", "price", "id"]
+CARD_FIELDS = "id,name,price,quantity,category_name,image_url,avg_rating"
+
+
+# Віртуальний користувач: власне з'єднання, генератор випадкових чисел і токени
+class VirtualUser:
+    def __init__(self, port, rnd, catalog, client_token, manager_token):
+        self.port = port
+        self.rnd = rnd
+        self.catalog = catalog
+        self.client_token = client_token
+        self.manager_token = manager_token
+        self.chat_last_id = None
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def product_id(self):
+        return self.rnd.choices(self.catalog["product_ids"], cum_weights=self.catalog["weights"])[0]
+
+    # Запит з повним читанням і розпакуванням відповіді; (статус, тіло)
+    def request(self, method, path, body=None, token=None):
+        headers = {"Accept-Encoding": "gzip"}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            body = response.read()
+            if response.getheader("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return response.status, body
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return None, b""
+
+
+# Сценарії: запит віртуального користувача; повертають статус відповіді
+def browse_catalog(user):
+    rnd = user.rnd
+    return user.request("GET", f"/products?limit=20&category_id={rnd.randint(1, len(seed.CATEGORIES))}"
+                               f"&sort_by={rnd.choice(SORTS)}&sort_order={rnd.choice(['asc', 'desc'])}"
+                               f"&fields={CARD_FIELDS}")[0]
+
+
+def search(user):
+    return user.request("GET", f"/products?limit=20&search={quote(user.rnd.choice(SEARCH_TERMS))}&fields={CARD_FIELDS}")[0]
+
+
+def view_product(user):
+    return user.request("GET", f"/products/{user.product_id()}")[0]
+
+
+def checkout(user):
+    items = [{"product_id": product_id, "quantity": 1}
+             for product_id in dict.fromkeys(user.product_id() for _ in range(user.rnd.randint(1, 3)))]
+    return user.request("POST", "/orders", {"items": items}, user.client_token)[0]
+
+
+# Короткі опитування нових повідомлень (без очікування), як у клієнті між оновленнями
+def chat_poll(user):
+    path = "/chat/messages" if user.chat_last_id is None else f"/chat/messages?since_id={user.chat_last_id}"
+    status, body = user.request("GET", path, token=user.client_token)
+    if status == 200:
+        user.chat_last_id = json.loads(body)["last_id"] or 0
+    return status
+
+
+# Останні замовлення або замовлення за тиждень до кінця періоду даних
+def manager_orders(user):
+    path = "/orders/history?limit=20"
+    if user.rnd.random() < 0.5:
+        path += f"&date_from={(user.catalog['last_order_date'] - timedelta(days=7)).isoformat()}"
+    return user.request("GET", path, token=user.manager_token)[0]
+
+
+# (назва, вага в суміші, функція, успішні статуси). Відмова через нестачу
+# залишку (400/409) - очікуваний результат оформлення, а не помилка сервера
+SCENARIOS = [
+    ("browse", 35, browse_catalog, {200}),
+    ("search", 15, search, {200}),
+    ("product", 25, view_product, {200}),
+    ("checkout", 5, checkout, {201, 400, 409}),
+    ("chat_poll", 15, chat_poll, {200}),
+    ("manager_orders", 5, manager_orders, {200}),
+]
+
+
+def generate_database(path, dataset, seed_value):
+    command = [sys.executable, "seed.py", "--db", path, "--seed", str(seed_value)]
+    for name, value in dataset.items():
+        command += [f"--{name.replace('_', '-')}", str(value)]
+    subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+
+# Товари та клієнти бази даних; популярність товарів - ті самі ваги Зіпфа, з якими
+# seed.py генерував замовлення та відгуки (той самий seed і порядок id)
+def load_catalog(path, clients_count, seed_value):
+    conn = sqlite3.connect(path)
+    try:
+        product_ids = [row[0] for row in conn.execute("SELECT id FROM products ORDER BY id")]
+        clients = [row[0] for row in conn.execute(
+            "SELECT username FROM users WHERE role = 'client' ORDER BY id LIMIT ?", (clients_count,))]
+        last_order_date = conn.execute("SELECT date(MAX(order_date)) FROM orders").fetchone()[0]
+    finally:
+        conn.close()
+    weights = seed.product_popularity(seed_value, len(product_ids))
+    return {"product_ids": product_ids, "weights": weights, "clients": clients,
+            "last_order_date": date.fromisoformat(last_order_date) if last_order_date else date.today()}
+
+
+def login(port, username, password):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request("POST", "/login", json.dumps({"username": username, "password": password}),
+                           {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        data = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"Не вдалося увійти як {username}: {data.get('message')}")
+    return data["token"]
+
+
+def server_command(mode, port):
+    python = sys.executable
+    if mode == "dev":
+        return [python, "-m", "flask", "--app", "server", "run", "--port", str(port)]
+    if mode == "gunicorn":
+        return ["gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    return [python, "wsgi.py"]
+
+
+# Суміш сценаріїв протягом duration секунд; затримки (мс) та помилки кожного сценарію
+def run_mix(users, duration):
+    names = [name for name, _, _, _ in SCENARIOS]
+    cum_weights = []
+    total = 0
+    for _, weight, _, _ in SCENARIOS:
+        total += weight
+        cum_weights.append(total)
+
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(user):
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.monotonic() < deadline:
+            name, _, scenario, accepted = user.rnd.choices(SCENARIOS, cum_weights=cum_weights)[0]
+            started = time.perf_counter()
+            status = scenario(user)
+            if status in accepted:
+                local[name].append((time.perf_counter() - started) * 1000)
+            else:
+                local_errors[name] += 1
+        with lock:
+            for name in names:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    def summary(values, error_count):
+        values.sort()
+        return {
+            "requests": len(values),
+            "errors": error_count,
+            "throughput": len(values) / elapsed,
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+        }
+
+    results = {name: summary(latencies[name], errors[name]) for name in names}
+    results["total"] = summary([value for values in latencies.values() for value in values], sum(errors.values()))
+    return results
+
+
+def print_results(results):
+    print(f"{'сценарій':<15} | {'запитів':>8} | {'запитів/с':>9} | {'p50 мс':>7} | {'p95 мс':>7} | "
+          f"{'p99 мс':>7} | {'помилок':>7}")
+    for name, result in results.items():
+        print(f"{name:<15} | {result['requests']:>8} | {result['throughput']:>9.1f} | {result['p50']:>7.1f} | "
+              f"{result['p95']:>7.1f} | {result['p99']:>7.1f} | {result['errors']:>7}")
+
+
+def baseline_path(name):
+    return os.path.join(BASELINES_DIR, f"{name}.json")
+
+
+def save_baseline(name, config, results):
+    os.makedirs(BASELINES_DIR, exist_ok=True)
+    with open(baseline_path(name), 'w', encoding='utf-8') as file:
+        json.dump({"config": config, "results": results}, file, ensure_ascii=False, indent=2)
+    print(f"Еталон збережено: {baseline_path(name)}")
+
+
+# Порівняння з еталоном; повертає список погіршень (p95 або пропускна здатність
+# гірші за еталон більше ніж на threshold, або з'явилися помилки)
+def compare_baseline(name, config, results, threshold):
+    with open(baseline_path(name), encoding='utf-8') as file:
+        baseline = json.load(file)
+    if baseline["config"] != config:
+        print("Увага: параметри запуску відрізняються від еталону")
+
+    regressions = []
+    print(f"{'сценарій':<15} | {'p95 мс':>17} | {'запитів/с':>19} | {'помилок':>9}")
+    for scenario, result in results.items():
+        expected = baseline["results"].get(scenario)
+        if not expected:
+            continue
+        p95_change = result["p95"] / expected["p95"] - 1 if expected["p95"] else 0
+        throughput_change = result["throughput"] / expected["throughput"] - 1 if expected["throughput"] else 0
+        worse = []
+        if p95_change > threshold:
+            worse.append("p95")
+        if throughput_change < -threshold:
+            worse.append("запитів/с")
+        if result["errors"] > expected["errors"]:
+            worse.append("помилки")
+        if worse:
+            regressions.append(f"{scenario}: {', '.join(worse)}")
+        print(f"{scenario:<15} | {expected['p95']:>6.1f} → {result['p95']:>6.1f} {p95_change:>+4.0%} | "
+              f"{expected['throughput']:>6.1f} → {result['throughput']:>6.1f} {throughput_change:>+4.0%} | "
+              f"{expected['errors']:>3} → {result['errors']:>3}{'  ПОГІРШЕННЯ' if worse else ''}")
+    return regressions
+
+
+def run(args):
+    dataset = {name: getattr(args, name) for name in DATASET}
+    dataset["end_date"] = args.end_date.isoformat()
+    workdir = tempfile.mkdtemp(prefix='robomag_load_')
+    try:
+        # Оформлення замовлень змінює базу даних, тому готова база копіюється
+        path = os.path.join(workdir, 'load.db')
+        if args.db:
+            shutil.copyfile(args.db, path)
+        else:
+            started = time.perf_counter()
+            generate_database(path, dataset, args.seed)
+            print(f"База даних згенерована за {time.perf_counter() - started:.1f} с: "
+                  + ", ".join(f"{name} {value}" for name, value in dataset.items()))
+
+        catalog = load_catalog(path, args.concurrency, args.seed)
+        env = {
+            "ROBOTICS_SHOP_DB": path,
+            "ROBOTICS_SHOP_PORT": str(args.port),
+            "ROBOTICS_SHOP_SECRET_KEY": "benchmark",
+        }
+        process = start_server(server_command(args.server, args.port), args.port, env, timeout=120)
+        try:
+            manager_token = login(args.port, seed.MANAGERS[0][0], seed.MANAGERS[0][2])
+            client_tokens = [login(args.port, username, seed.GENERATED_PASSWORD) for username in catalog["clients"]]
+            users = [VirtualUser(args.port, random.Random(args.seed + index), catalog,
+                                 client_tokens[index % len(client_tokens)], manager_token)
+                     for index in range(args.concurrency)]
+
+            print(f"сервер: {args.server}, потоків клієнта: {args.concurrency}, тривалість: {args.duration} с")
+            run_mix(users, args.warmup)
+            results = run_mix(users, args.duration)
+        finally:
+            stop_server(process)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+
+    config = {"server": args.server, "concurrency": args.concurrency, "duration": args.duration,
+              "seed": args.seed, "dataset": "custom" if args.db else dataset}
+    if args.save_baseline:
+        save_baseline(args.save_baseline, config, results)
+    if args.compare:
+        regressions = compare_baseline(args.compare, config, results, args.threshold)
+        if regressions:
+            print("Погіршення відносно еталону: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Навантажувальний тест сервера на суміші сценаріїв")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="кількість віртуальних користувачів")
+    parser.add_argument("--duration", type=float, default=DURATION, help="тривалість вимірювання, с")
+    parser.add_argument("--warmup", type=float, default=WARMUP, help="тривалість розігріву, с")
+    parser.add_argument("--server", choices=["waitress", "dev", "gunicorn"], default="waitress",
+                        help="режим сервера: wsgi.py, flask run або gunicorn.conf.py")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--seed", type=int, default=42, help="початкове значення генераторів")
+    for name, value in DATASET.items():
+        parser.add_argument(f"--{name}", type=int, default=value, help=f"seed.py --{name}")
+    parser.add_argument("--end-date", type=seed.parse_end_date, default=seed.DEFAULT_END_DATE,
+                        help="seed.py --end-date")
+    parser.add_argument("--db", help="готова база даних замість генерації (копіюється)")
+    parser.add_argument("--save-baseline", metavar="ІМ'Я", help="зберегти результати як еталон")
+    parser.add_argument("--compare", metavar="ІМ'Я", help="порівняти результати з еталоном")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="допустиме погіршення p95 та запитів/с (частка)")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+﻿# benchmarks/payload_size.py
+# Розмір відповідей та час їх формування на каталозі з 10000 товарів:
+# без стиснення, gzip, brotli (якщо встановлено) та з проєкцією fields=.
+# Час передачі оцінюється для каналу BANDWIDTH_MBIT Мбіт/с.
+#   python -m benchmarks.payload_size [товарів] [замовлень]
+import random
+import sys
+import time
+
+import db
+import compression
+from benchmarks.common import fresh_database, populate_catalog
+
+PRODUCTS = 10000
+ORDERS = 2000
+REPEAT = 20
+BANDWIDTH_MBIT = 10
+
+CARD_FIELDS = "id,name,price,quantity,category_name,image_url,avg_rating"
+WORDS = ["плата", "датчик", "модуль", "живлення", "контролер", "двигун", "напруга", "струм",
+         "роз'єм", "корпус", "сумісний", "Arduino", "Raspberry", "швидкість", "точність", "вихід"]
+
+
+def populate_orders(conn, products_count, orders_count, seed=42):
+    rnd = random.Random(seed)
+    cursor = conn.cursor()
+    cursor.executemany("UPDATE products SET description = ? WHERE id = ?",
+                       [(" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(40, 120))), product_id)
+                        for product_id in range(1, products_count + 1)])
+    cursor.execute("INSERT INTO users (username, password, email, role) VALUES ('manager', '', 'manager@example.com', 'manager')")
+    cursor.executemany("INSERT INTO orders (user_id, order_date, status, total_price) VALUES (?, ?, ?, ?)",
+                       [(rnd.randint(1, 5), f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 12:00:00",
+                         "Доставлено", 0) for _ in range(orders_count)])
+    cursor.executemany("INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)",
+                       [(order_id, rnd.randint(1, products_count), rnd.randint(1, 3), 100)
+                        for order_id in range(1, orders_count + 1) for _ in range(rnd.randint(1, 5))])
+    conn.commit()
+
+
+def measure_request(client, path, headers):
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.status_code
+    size = len(response.data)
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        client.get(path, headers=headers)
+    return size, (time.perf_counter() - started) / REPEAT * 1000
+
+
+def run(products_count=PRODUCTS, orders_count=ORDERS):
+    fresh_database('payload.db')
+    with db.get_db() as conn:
+        populate_catalog(conn, products_count)
+        populate_orders(conn, products_count, orders_count)
+
+    import server
+    client = server.app.test_client()
+    token = server.jwt.encode({"user_id": 6, "username": "manager", "role": "manager",
+                               "exp": server.datetime.datetime.utcnow() + server.datetime.timedelta(hours=1)},
+                              server.app.config['SECRET_KEY'], algorithm="HS256")
+
+    cases = [
+        ("GET /products?limit=200", "/products?limit=200", {}),
+        ("GET /products?limit=200&fields=...", f"/products?limit=200&fields={CARD_FIELDS}", {}),
+        ("GET /orders/history?limit=100", "/orders/history?limit=100", {"Authorization": f"Bearer {token}"}),
+        ("GET /orders/history?limit=100&fields=...", "/orders/history?limit=100&fields=id,username,order_date,status,total_price",
+         {"Authorization": f"Bearer {token}"}),
+    ]
+    encodings = ["identity"] + compression.ENCODINGS
+
+    print(f"товарів: {products_count}, замовлень: {orders_count}; час передачі - для {BANDWIDTH_MBIT} Мбіт/с")
+    print(f"{'запит':<42} | {'кодування':>9} | {'байт':>8} | {'сервер, мс':>10} | {'передача, мс':>12}")
+    for title, path, headers in cases:
+        for encoding in encodings:
+            size, server_ms = measure_request(client, path, {**headers, "Accept-Encoding": encoding})
+            transfer_ms = size * 8 / (BANDWIDTH_MBIT * 1000)
+            print(f"{title:<42} | {encoding:>9} | {size:>8} | {server_ms:>10.2f} | {transfer_ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
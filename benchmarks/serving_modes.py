@@ -0,0 +1,64 @@
+﻿# benchmarks/serving_modes.py
+# Порівняння сервера розробки Flask з робочим режимом (wsgi.py: waitress,
+# gunicorn.conf.py: gunicorn) на GET /products. Кеш відповідей вимкнено,
+# щоб кожен запит доходив до бази даних. Усі режими працюють з однаковим
+# профілем зберігання (STORAGE_PROFILE), тож порівнюються лише сервери.
+#   python -m benchmarks.serving_modes [товарів] [потоків клієнта] [секунд]
+import shutil
+import sys
+
+import db
+from benchmarks.common import fresh_database, populate_catalog, start_server, stop_server, run_load
+
+PRODUCTS = 5000
+CONCURRENCY = 16
+DURATION = 10
+PORT = 5099
+STORAGE_PROFILE = "production"
+
+SORTS = ["name", "price", "id"]
+
+
+def catalog_path(rnd):
+    return (f"/products?limit=50&sort_by={rnd.choice(SORTS)}&sort_order={rnd.choice(['asc', 'desc'])}"
+            f"&category_id={rnd.randint(1, 10)}")
+
+
+def modes():
+    python = sys.executable
+    yield "Flask dev server", [python, "-m", "flask", "--app", "server", "run", "--port", str(PORT)]
+    yield "waitress (wsgi.py)", [python, "wsgi.py"]
+    if shutil.which("gunicorn"):
+        yield "gunicorn (gunicorn.conf.py)", ["gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+
+
+def run(products=PRODUCTS, concurrency=CONCURRENCY, duration=DURATION):
+    path = fresh_database('serving.db')
+    with db.get_db() as conn:
+        populate_catalog(conn, products)
+    db.pool.close_all()
+
+    env = {
+        "ROBOTICS_SHOP_DB": path,
+        "ROBOTICS_SHOP_PORT": str(PORT),
+        "ROBOTICS_SHOP_CACHE_SIZE": "0",
+        "ROBOTICS_SHOP_SECRET_KEY": "benchmark",
+        "ROBOTICS_SHOP_STORAGE_PROFILE": STORAGE_PROFILE,
+    }
+
+    print(f"товарів: {products}, потоків клієнта: {concurrency}, тривалість: {duration} с, "
+          f"профіль зберігання: {STORAGE_PROFILE}")
+    print(f"{'режим':<28} | {'запитів/с':>9} | {'p50 мс':>7} | {'p95 мс':>7} | {'p99 мс':>7} | {'помилок':>7}")
+    for name, command in modes():
+        process = start_server(command, PORT, env)
+        try:
+            run_load(PORT, catalog_path, concurrency, 1)
+            result = run_load(PORT, catalog_path, concurrency, duration)
+        finally:
+            stop_server(process)
+        print(f"{name:<28} | {result['throughput']:>9.1f} | {result['p50']:>7.1f} | {result['p95']:>7.1f} | "
+              f"{result['p99']:>7.1f} | {result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,89 @@
+﻿# benchmarks/storage_contention.py
+# Пропускна здатність читачів і записувачів, що одночасно працюють з однією
+# базою даних, для кожного профілю зберігання з db.STORAGE_PROFILES.
+# Читачі вибирають сторінку каталогу, записувачі оформлюють замовлення
+# (BEGIN IMMEDIATE, нове замовлення та списання залишку).
+#   python -m benchmarks.storage_contention [читачів] [записувачів] [секунд]
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+import db
+from benchmarks.common import fresh_database, populate_catalog, percentile
+
+READERS = 8
+WRITERS = 2
+DURATION = 5
+PRODUCTS = 2000
+
+
+def reader(conn, rnd, deadline, result):
+    while time.monotonic() < deadline:
+        try:
+            conn.execute("""
+                SELECT p.*, c.name as category_name FROM products p
+                LEFT JOIN categories c ON p.category_id = c.id
+                WHERE p.category_id = ? ORDER BY p.price, p.id LIMIT 50
+            """, (rnd.randint(1, 10),)).fetchall()
+            result["reads"] += 1
+        except sqlite3.OperationalError:
+            result["read_errors"] += 1
+
+
+def writer(conn, rnd, deadline, result):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO orders (user_id, total_price) VALUES (1, 10)")
+            conn.execute("UPDATE products SET quantity = quantity - 1 WHERE id = ? AND quantity >= 1",
+                         (rnd.randint(1, PRODUCTS),))
+            conn.commit()
+            result["writes"] += 1
+            result["write_latencies"].append((time.perf_counter() - started) * 1000)
+        except sqlite3.OperationalError:
+            if conn.in_transaction:
+                conn.rollback()
+            result["write_errors"] += 1
+
+
+def run_profile(profile, readers, writers, duration):
+    path = fresh_database(f'{profile}.db')
+    with db.get_db() as conn:
+        populate_catalog(conn, PRODUCTS)
+    db.pool.close_all()
+
+    connections = [db.connect(path, profile, check_same_thread=False) for _ in range(readers + writers)]
+    results = [{"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0, "write_latencies": []}
+               for _ in connections]
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=reader if index < readers else writer,
+                         args=(conn, random.Random(index), deadline, result))
+        for index, (conn, result) in enumerate(zip(connections, results))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for conn in connections:
+        conn.close()
+
+    total = {key: sum(result[key] for result in results) for key in ("reads", "writes", "read_errors", "write_errors")}
+    latencies = sorted(latency for result in results for latency in result["write_latencies"])
+    print(f"{profile:<12} | {total['reads'] / duration:>9.0f} | {total['writes'] / duration:>9.0f} | "
+          f"{percentile(latencies, 0.95):>11.1f} | {total['read_errors']:>13} | {total['write_errors']:>13}")
+
+
+def run(readers=READERS, writers=WRITERS, duration=DURATION):
+    print(f"читачів: {readers}, записувачів: {writers}, тривалість: {duration} с")
+    print(f"{'профіль':<12} | {'читань/с':>9} | {'записів/с':>9} | {'запис p95 мс':>11} | "
+          f"{'помилок читання':>13} | {'помилок запису':>13}")
+    for profile in db.STORAGE_PROFILES:
+        run_profile(profile, readers, writers, duration)
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,95 @@
+﻿# cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Налаштування кешів (можна перевизначити змінними оточення)
+CACHE_SIZE = int(os.environ.get('ROBOTICS_SHOP_CACHE_SIZE', '256'))
+CACHE_TTL = float(os.environ.get('ROBOTICS_SHOP_CACHE_TTL', '30'))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('ROBOTICS_SHOP_PRINCIPAL_CACHE_SIZE', '1024'))
+PRINCIPAL_CACHE_TTL = float(os.environ.get('ROBOTICS_SHOP_PRINCIPAL_CACHE_TTL', '10'))
+
+
+# Кеш у пам'яті процесу з обмеженням розміру (LRU) та часом життя записів.
+# Ключ запису - кортеж, що починається з простору імен та ідентифікатора.
+class TTLCache:
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    # Номер покоління змінюється при кожній інвалідації; значення, обчислене
+    # до інвалідації, не потрапляє в кеш
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value, generation):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # Видалення всіх записів простору імен або лише записів з указаними ідентифікаторами
+    def invalidate(self, namespace, *idents):
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._entries
+                     if key[0] == namespace and (not idents or key[1] in idents)]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["max_size"] = self.max_size
+        stats["ttl"] = self.ttl
+        requests_total = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / requests_total if requests_total else 0
+        return stats
+
+
+# Відповіді каталогу: ключ (простір імен, id товару, параметри запиту, версія каталогу)
+response_cache = TTLCache()
+
+# Перевірені користувачі token_required: ключ ('user', id користувача, токен)
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
@@ -2,10 +2,17 @@
 import streamlit as st
 import requests
 import json
+import os
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Конфігурація API
-API_URL = "http://localhost:5000"
+# Конфігурація API (можна перевизначити змінними оточення)
+API_URL = os.environ.get("ROBOTICS_SHOP_API_URL", "http://localhost:5000")
+API_TIMEOUT = float(os.environ.get("ROBOTICS_SHOP_API_TIMEOUT", "10"))
+API_RETRIES = int(os.environ.get("ROBOTICS_SHOP_API_RETRIES", "3"))
+API_BACKOFF = float(os.environ.get("ROBOTICS_SHOP_API_BACKOFF", "0.3"))
+API_POOL_SIZE = int(os.environ.get("ROBOTICS_SHOP_API_POOL_SIZE", "10"))
 
 # Кольорова гама (з прикладу на зображенні)
 COLORS = {
@@ -23,29 +30,135 @@ COLORS = {
     "dark_bg": "#333333"    # Темний фон для акцентів
 }
 
+# HTTP-клієнт API: одна сесія requests з пулом постійних з'єднань (keep-alive),
+# тайм-аутом за замовчуванням та повторами з експоненційною затримкою.
+# Повторюються лише ідемпотентні запити (GET, PUT, DELETE) при помилках мережі
+# та відповідях 502/503/504; POST повторюється лише, якщо з'єднання не вдалося встановити.
+# requests надсилає Accept-Encoding (gzip, deflate та br, якщо встановлено brotli)
+# і розпаковує стиснені відповіді автоматично
+class ApiClient:
+    def __init__(self, base_url=API_URL, timeout=API_TIMEOUT, retries=API_RETRIES,
+                 backoff=API_BACKOFF, pool_size=API_POOL_SIZE):
+        self.base_url = base_url
+        self.timeout = timeout
+        
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def request(self, method, path, timeout=None, **kwargs):
+        return self.session.request(method, f"{self.base_url}{path}", timeout=timeout or self.timeout, **kwargs)
+
+# Один клієнт на процес Streamlit, спільний для всіх сесій
+@st.cache_resource
+def get_api_client():
+    return ApiClient()
+
+# Усі звернення до API проходять через цю функцію; лічильник показує
+# кількість запитів за поточний перезапуск скрипта
+def api_request(method, path, **kwargs):
+    st.session_state.api_calls = st.session_state.get("api_calls", 0) + 1
+    return get_api_client().request(method, path, **kwargs)
+
 # Функції для взаємодії з API
 def register_user(username, password, email, role="client"):
-    response = requests.post(
-        f"{API_URL}/register",
+    response = api_request(
+        "POST", "/register",
         json={"username": username, "password": password, "email": email, "role": role}
     )
     return response.json()
 
 def login_user(username, password):
-    response = requests.post(
-        f"{API_URL}/login",
+    response = api_request(
+        "POST", "/login",
         json={"username": username, "password": password}
     )
     return response.json()
 
+# Кількість збережених відповідей з ETag на сесію
+VALIDATORS_LIMIT = 64
+
+# Умовний GET: збережений ETag надсилається в If-None-Match, і на відповідь 304
+# повертаються збережені дані без повторного завантаження
+def get_with_validator(path, params=None):
+    validators = st.session_state.setdefault("validators", {})
+    key = (path, tuple(sorted((params or {}).items())))
+    stored = validators.get(key)
+    headers = {"If-None-Match": stored[0]} if stored else {}
+    
+    response = api_request("GET", path, params=params, headers=headers)
+    if response.status_code == 304 and stored:
+        return stored[1]
+    
+    data = response.json()
+    etag = response.headers.get("ETag")
+    if response.status_code == 200 and etag:
+        validators.pop(key, None)
+        validators[key] = (etag, data)
+        if len(validators) > VALIDATORS_LIMIT:
+            validators.pop(next(iter(validators)))
+    return data
+
+# Час життя кешованих відповідей каталогу (секунди). Кеш спільний для всіх сесій,
+# зміни, зроблені в цьому клієнті, скидають відповідні записи одразу (invalidate_*),
+# а після закінчення TTL відповідь перевіряється умовним GET
+CATALOG_CACHE_TTL = 60
+
+# Відповідь каталогу; помилка стає винятком, щоб не потрапити в кеш
+def get_catalog(path, params=None):
+    data = get_with_validator(path, params)
+    if not data.get("success"):
+        raise ValueError(data.get("message", "Помилка API"))
+    return data
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def fetch_categories():
+    return get_catalog("/categories")
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def fetch_products(params):
+    return get_catalog("/products", params)
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def fetch_product(product_id):
+    return get_catalog(f"/products/{product_id}")
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def fetch_product_reviews(product_id, params):
+    return get_catalog(f"/products/{product_id}/reviews", params)
+
+# Скидання кешу після змін: списки товарів та картки вказаних товарів (без id - усі картки)
+def invalidate_products(*product_ids):
+    fetch_products.clear()
+    if product_ids:
+        for product_id in product_ids:
+            fetch_product.clear(product_id)
+    else:
+        fetch_product.clear()
+
+def invalidate_reviews():
+    fetch_product_reviews.clear()
+
+def invalidate_categories():
+    fetch_categories.clear()
+
 def get_categories():
     try:
-        response = requests.get(f"{API_URL}/categories")
-        return response.json().get("categories", [])
+        return fetch_categories().get("categories", [])
     except:
         return []
 
-def get_products(category_id=None, search="", sort_by="name", sort_order="asc", min_price=None, max_price=None):
+# Повертає сторінку товарів та курсор наступної сторінки (None, якщо сторінка остання)
+def get_products(category_id=None, search="", sort_by="name", sort_order="asc", min_price=None, max_price=None, limit=None, cursor=None, fields=None):
     params = {}
     if category_id:
         params["category_id"] = category_id
@@ -59,44 +172,84 @@ def get_products(category_id=None, search="", sort_by="name", sort_order="asc",
         params["min_price"] = min_price
     if max_price:
         params["max_price"] = max_price
+    if limit:
+        params["limit"] = limit
+    if cursor:
+        params["cursor"] = cursor
+    if fields:
+        params["fields"] = fields
     
     try:
-        response = requests.get(f"{API_URL}/products", params=params)
-        return response.json().get("products", [])
+        data = fetch_products(params)
+        return data.get("products", []), data.get("next_cursor")
     except:
-        return []
+        return [], None
+
+# Полегшені записи товарів за списком id одним запитом (None, якщо сервер недоступний).
+# Не кешується: кошик має показувати поточні ціни та залишки
+def get_products_by_ids(product_ids):
+    try:
+        data = get_with_validator("/products", {"ids": ",".join(str(product_id) for product_id in product_ids)})
+        if not data.get("success"):
+            return None, []
+        return {product["id"]: product for product in data.get("products", [])}, data.get("missing", [])
+    except:
+        return None, []
 
 def get_product_details(product_id):
     try:
-        response = requests.get(f"{API_URL}/products/{product_id}")
-        return response.json().get("product", {})
+        return fetch_product(product_id).get("product", {})
     except:
         return {}
 
+# Повертає сторінку відгуків товару та курсор наступної сторінки
+def get_product_reviews(product_id, limit=None, cursor=None):
+    params = {}
+    if limit:
+        params["limit"] = limit
+    if cursor:
+        params["cursor"] = cursor
+    
+    try:
+        data = fetch_product_reviews(product_id, params)
+        return data.get("reviews", []), data.get("next_cursor")
+    except:
+        return [], None
+
 def create_order(items, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.post(
-        f"{API_URL}/orders",
+    response = api_request(
+        "POST", "/orders",
         json={"items": items},
         headers=headers
     )
     return response.json()
 
-def get_order_history(token, user_id=None, status=None):
+# Повертає сторінку замовлень та курсор наступної сторінки (None, якщо сторінка остання)
+def get_order_history(token, user_id=None, status=None, date_from=None, date_to=None, limit=None, cursor=None):
     headers = {"Authorization": f"Bearer {token}"}
     params = {}
     if user_id:
         params["user_id"] = user_id
     if status:
         params["status"] = status
+    if date_from:
+        params["date_from"] = date_from
+    if date_to:
+        params["date_to"] = date_to
+    if limit:
+        params["limit"] = limit
+    if cursor:
+        params["cursor"] = cursor
     
-    response = requests.get(f"{API_URL}/orders/history", headers=headers, params=params)
-    return response.json().get("orders", [])
+    response = api_request("GET", "/orders/history", headers=headers, params=params)
+    data = response.json()
+    return data.get("orders", []), data.get("next_cursor")
 
 def add_review(product_id, rating, comment, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.post(
-        f"{API_URL}/products/{product_id}/reviews",
+    response = api_request(
+        "POST", f"/products/{product_id}/reviews",
         json={"rating": rating, "comment": comment},
         headers=headers
     )
@@ -104,8 +257,8 @@ def add_review(product_id, rating, comment, token):
 
 def add_product(name, description, price, quantity, category_id, image_url, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.post(
-        f"{API_URL}/products",
+    response = api_request(
+        "POST", "/products",
         json={
             "name": name,
             "description": description,
@@ -120,8 +273,8 @@ def add_product(name, description, price, quantity, category_id, image_url, toke
 
 def update_product(product_id, data, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.put(
-        f"{API_URL}/products/{product_id}",
+    response = api_request(
+        "PUT", f"/products/{product_id}",
         json=data,
         headers=headers
     )
@@ -129,13 +282,26 @@ def update_product(product_id, data, token):
 
 def delete_product(product_id, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.delete(f"{API_URL}/products/{product_id}", headers=headers)
+    response = api_request("DELETE", f"/products/{product_id}", headers=headers)
+    return response.json()
+
+# Масовий імпорт товарів з файлу CSV або JSON Lines (file_format: csv або jsonl)
+def import_products(file, file_format, token, dry_run=False):
+    content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": content_type}
+    params = {"dry_run": 1} if dry_run else {}
+    response = api_request("POST", "/products/import", data=file, headers=headers, params=params)
     return response.json()
 
+def export_products(file_format, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = api_request("GET", "/products/export", headers=headers, params={"format": file_format})
+    return response.content if response.status_code == 200 else None
+
 def add_category(name, description, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.post(
-        f"{API_URL}/categories",
+    response = api_request(
+        "POST", "/categories",
         json={"name": name, "description": description},
         headers=headers
     )
@@ -143,8 +309,8 @@ def add_category(name, description, token):
 
 def update_category(category_id, name, description, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.put(
-        f"{API_URL}/categories/{category_id}",
+    response = api_request(
+        "PUT", f"/categories/{category_id}",
         json={"name": name, "description": description},
         headers=headers
     )
@@ -152,34 +318,71 @@ def update_category(category_id, name, description, token):
 
 def delete_category(category_id, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.delete(f"{API_URL}/categories/{category_id}", headers=headers)
+    response = api_request("DELETE", f"/categories/{category_id}", headers=headers)
     return response.json()
 
 def update_order_status(order_id, status, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.put(
-        f"{API_URL}/orders/{order_id}/status",
+    response = api_request(
+        "PUT", f"/orders/{order_id}/status",
         json={"status": status},
         headers=headers
     )
     return response.json()
 
-def get_chat_messages(token, client_id=None):
+# Аналітика продажів за період (без дат - останні 30 днів)
+def get_sales_analytics(token, date_from=None, date_to=None, limit=None):
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {}
+    if date_from:
+        params["date_from"] = date_from
+    if date_to:
+        params["date_to"] = date_to
+    if limit:
+        params["limit"] = limit
+    
+    response = api_request("GET", "/analytics/sales", headers=headers, params=params)
+    return response.json()
+
+# since_id - лише нові повідомлення; wait - довге опитування (секунди очікування на сервері)
+def get_chat_messages(token, client_id=None, since_id=None, wait=None):
     headers = {"Authorization": f"Bearer {token}"}
     params = {}
     if client_id:
         params["client_id"] = client_id
+    if since_id is not None:
+        params["since_id"] = since_id
+    if wait:
+        params["wait"] = wait
     
-    response = requests.get(f"{API_URL}/chat/messages", headers=headers, params=params)
+    # Довге опитування: сервер може тримати запит до wait секунд
+    timeout = API_TIMEOUT + (wait or 0)
+    response = api_request("GET", "/chat/messages", headers=headers, params=params, timeout=timeout)
     return response.json()
 
+# Повертає сторінку розмов скриньки менеджера та курсор наступної сторінки
+def get_chat_inbox(token, limit=None, cursor=None):
+    headers = {"Authorization": f"Bearer {token}"}
+    params = {}
+    if limit:
+        params["limit"] = limit
+    if cursor:
+        params["cursor"] = cursor
+    
+    try:
+        response = api_request("GET", "/chat/inbox", headers=headers, params=params)
+        data = response.json()
+        return data.get("conversations", []), data.get("next_cursor")
+    except:
+        return [], None
+
 def send_chat_message(message, token, client_id=None):
     headers = {"Authorization": f"Bearer {token}"}
     data = {"message": message}
     if client_id:
         data["client_id"] = client_id
     
-    response = requests.post(f"{API_URL}/chat/messages", json=data, headers=headers)
+    response = api_request("POST", "/chat/messages", json=data, headers=headers)
     return response.json()
 
 def update_profile(token, username=None, email=None, current_password=None, new_password=None):
@@ -193,12 +396,12 @@ def update_profile(token, username=None, email=None, current_password=None, new_
         data["current_password"] = current_password
         data["new_password"] = new_password
     
-    response = requests.put(f"{API_URL}/users/profile", json=data, headers=headers)
+    response = api_request("PUT", "/users/profile", json=data, headers=headers)
     return response.json()
 
 def delete_user(user_id, token):
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.delete(f"{API_URL}/users/{user_id}", headers=headers)
+    response = api_request("DELETE", f"/users/{user_id}", headers=headers)
     return response.json()
 
 # Налаштування Streamlit
@@ -391,6 +594,9 @@ def warning_message(message):
     </div>
     """, unsafe_allow_html=True)
 
+# Поля товару, потрібні картці та кнопці "У кошик" (без опису)
+PRODUCT_CARD_FIELDS = "id,name,price,quantity,category_name,image_url,avg_rating"
+
 # Функція для рендерингу картки товару
 def render_product_card(product):
     st.markdown(f"""
@@ -427,9 +633,81 @@ if "authenticated" not in st.session_state:
     st.session_state.product_added = False
     st.session_state.order_completed = False
 
+# Посторінкові списки, що накопичуються в сесії
+PAGED_LISTS = ["catalog_pages", "manage_products_pages", "orders_pages", "manage_orders_pages", "inbox_pages", "reviews_pages"]
+
+# Завантаження списку посторінково (fetch_page повертає записи та курсор наступної сторінки)
+def load_pages(state_key, fetch_page, **filters):
+    state = st.session_state.get(state_key)
+    
+    # Нові фільтри - починаємо з першої сторінки
+    if state is None or state["filters"] != filters:
+        items, next_cursor = fetch_page(**filters)
+        state = {"filters": filters, "items": items, "next_cursor": next_cursor}
+        st.session_state[state_key] = state
+    
+    return state
+
+def load_more_pages(state_key, fetch_page):
+    state = st.session_state[state_key]
+    items, next_cursor = fetch_page(cursor=state["next_cursor"], **state["filters"])
+    state["items"].extend(items)
+    state["next_cursor"] = next_cursor
+
+# Скидання завантажених сторінок (після змін даних)
+def reset_pages():
+    for state_key in PAGED_LISTS:
+        st.session_state.pop(state_key, None)
+
+# Період автоматичного оновлення чату (секунди)
+CHAT_REFRESH_SECONDS = 5
+
+# Історія чату зберігається в стані сесії: повна історія завантажується один раз,
+# далі запитуються лише повідомлення, новіші за останнє отримане
+def load_chat(client_id=None):
+    state = st.session_state.get("chat_history")
+    
+    if state is None or state["client_id"] != client_id:
+        result = get_chat_messages(st.session_state.token, client_id=client_id)
+        if not result.get("success"):
+            return result
+        state = {"client_id": client_id, "messages": result.get("messages", []), "last_id": result.get("last_id")}
+        st.session_state.chat_history = state
+    else:
+        result = get_chat_messages(st.session_state.token, client_id=client_id, since_id=state["last_id"] or 0)
+        if not result.get("success"):
+            return result
+        state["messages"].extend(result.get("messages", []))
+        state["last_id"] = result.get("last_id")
+    
+    return {"success": True, "messages": state["messages"]}
+
+# Оновлення цін та залишків усіх позицій кошика одним запитом
+def refresh_cart():
+    products, missing = get_products_by_ids([item["product_id"] for item in st.session_state.cart])
+    if products is None:
+        return
+    
+    for item in st.session_state.cart:
+        product = products.get(item["product_id"])
+        if not product:
+            continue
+        if product["price"] != item["price"]:
+            warning_message(f"Ціна товару '{product['name']}' змінилася: {item['price']} → {product['price']} грн")
+        item.update(name=product["name"], price=product["price"],
+                    image_url=product.get("image_url") or "", available=product["quantity"])
+    
+    # Видалені товари прибираються з кошика
+    if missing:
+        removed = [item["name"] for item in st.session_state.cart if item["product_id"] in missing]
+        warning_message(f"Товари більше недоступні та видалені з кошика: {', '.join(removed)}")
+        st.session_state.cart = [item for item in st.session_state.cart if item["product_id"] not in missing]
+
 # Функції навігації
 def navigate_to(page):
     st.session_state.current_page = page
+    reset_pages()
+    st.session_state.pop("chat_history", None)
 
 # Застосування стилів
 apply_custom_style()
@@ -499,7 +777,10 @@ with st.sidebar:
             st.session_state.token = None
             st.session_state.cart = []
             st.session_state.current_page = "home"
-            st.cache_data.clear()
+            reset_pages()
+    
+    # Заповнюється в кінці скрипта, коли відомі всі запити цього перезапуску
+    api_calls_placeholder = st.empty()
 
 # Головні сторінки
 if st.session_state.current_page == "home":
@@ -516,7 +797,7 @@ if st.session_state.current_page == "home":
     
     # Відображення останніх доданих товарів
     st.subheader("Останні надходження")
-    products = get_products(sort_by="id", sort_order="desc")[:4]
+    products, _ = get_products(sort_by="id", sort_order="desc", limit=4, fields=PRODUCT_CARD_FIELDS)
     
     # Відображення товарів у сітці
     col1, col2 = st.columns(2)
@@ -558,6 +839,11 @@ elif st.session_state.current_page == "catalog":
             
             st.session_state.selected_category = selected_category
         
+        with col3:
+            # Пошук (до сортування: від нього залежить, чи доступне сортування за релевантністю)
+            search_query = st.text_input("Пошук товарів", value=st.session_state.search_query)
+            st.session_state.search_query = search_query
+        
         with col2:
             # Сортування
             sort_options = {
@@ -567,6 +853,10 @@ elif st.session_state.current_page == "catalog":
                 "price_desc": "Ціна (спадання)"
             }
             
+            # Релевантність має сенс лише під час пошуку; без нього - сортування за замовчуванням
+            if search_query.strip():
+                sort_options["relevance_desc"] = "За релевантністю"
+            
             selected_sort = st.selectbox("Сортування", list(sort_options.values()))
             
             # Знаходимо ключ обраного сортування
@@ -579,11 +869,6 @@ elif st.session_state.current_page == "catalog":
             st.session_state.sort_by = sort_field
             st.session_state.sort_order = sort_direction
         
-        with col3:
-            # Пошук
-            search_query = st.text_input("Пошук товарів", value=st.session_state.search_query)
-            st.session_state.search_query = search_query
-        
         # Фільтр за ціною
         col1, col2 = st.columns(2)
         with col1:
@@ -595,19 +880,23 @@ elif st.session_state.current_page == "catalog":
             st.session_state.max_price = max_price if max_price > 0 else None
     
     # Отримання відфільтрованих товарів
-    products = get_products(
+    catalog_pages = load_pages(
+        "catalog_pages",
+        get_products,
         category_id=st.session_state.selected_category,
         search=st.session_state.search_query,
         sort_by=st.session_state.sort_by,
         sort_order=st.session_state.sort_order,
         min_price=st.session_state.min_price,
-        max_price=st.session_state.max_price
+        max_price=st.session_state.max_price,
+        fields=PRODUCT_CARD_FIELDS
     )
+    products = catalog_pages["items"]
     
     if not products:
         info_message("Товарів не знайдено. Спробуйте змінити параметри пошуку.")
     else:
-        st.subheader(f"Знайдено товарів: {len(products)}")
+        st.subheader(f"Показано товарів: {len(products)}")
         
         # Відображення товарів у сітці
         cols = st.columns(3)
@@ -648,6 +937,11 @@ elif st.session_state.current_page == "catalog":
                                     "image_url": product.get("image_url", "")
                                 })
                                 st.session_state.product_added = f"Товар '{product['name']}' додано до кошика."
+        
+        # Завантаження наступної сторінки товарів
+        if catalog_pages["next_cursor"]:
+            st.button("Показати ще", key="catalog_more", use_container_width=True,
+                      on_click=load_more_pages, args=("catalog_pages", get_products))
                                 
         # Відображення повідомлення про додання товару
         if st.session_state.product_added:
@@ -724,7 +1018,14 @@ elif st.session_state.current_page == "product_details":
             # Відгуки
             st.markdown("### Відгуки")
             
-            reviews = product.get("reviews", [])
+            # Перша сторінка відгуків приходить разом з товаром, наступні - на вимогу
+            review_filters = {"product_id": product["id"]}
+            reviews_pages = st.session_state.get("reviews_pages")
+            if reviews_pages is None or reviews_pages["filters"] != review_filters:
+                reviews_pages = {"filters": review_filters, "items": product.get("reviews", []),
+                                 "next_cursor": product.get("reviews_next_cursor")}
+                st.session_state.reviews_pages = reviews_pages
+            reviews = reviews_pages["items"]
             
             # Форма для додавання відгуку (для авторизованих клієнтів)
             if st.session_state.authenticated and st.session_state.user['role'] == 'client':
@@ -737,7 +1038,9 @@ elif st.session_state.current_page == "product_details":
                         
                         if result.get("success"):
                             success_message(result.get("message", "Відгук успішно додано"))
-                            st.cache_data.clear()
+                            invalidate_products(product["id"])
+                            invalidate_reviews()
+                            reset_pages()
                             st.rerun()
                         else:
                             error_message(result.get("message", "Помилка при додаванні відгуку"))
@@ -753,6 +1056,10 @@ elif st.session_state.current_page == "product_details":
                         {review['comment'] if review['comment'] else 'Без коментаря'}
                         """)
                         st.markdown("---")
+                
+                if reviews_pages["next_cursor"]:
+                    st.button("Показати ще відгуки", key="reviews_more", use_container_width=True,
+                              on_click=load_more_pages, args=("reviews_pages", get_product_reviews))
             else:
                 st.info("Ще немає відгуків для цього товару.")
 
@@ -827,6 +1134,9 @@ elif st.session_state.current_page == "cart":
     else:
         st.title("Кошик")
         
+        if st.session_state.cart:
+            refresh_cart()
+        
         if not st.session_state.cart:
             info_message("Ваш кошик порожній")
             if st.button("Перейти до каталогу", use_container_width=True):
@@ -848,6 +1158,10 @@ elif st.session_state.current_page == "cart":
                     
                     with col2:
                         st.markdown(f"Ціна: {item['price']} грн за шт.")
+                        if "available" in item:
+                            st.markdown(f"В наявності: {item['available']} шт.")
+                            if item['quantity'] > item['available']:
+                                st.markdown("**Недостатньо товару на складі**")
                     
                     with col3:
                         new_quantity = st.number_input(f"Кількість", min_value=1, value=item['quantity'], key=f"cart_qty_{i}")
@@ -884,6 +1198,9 @@ elif st.session_state.current_page == "cart":
                 result = create_order(items, st.session_state.token)
                 
                 if result.get("success"):
+                    # Змінилися залишки замовлених товарів
+                    invalidate_products(*(item["product_id"] for item in st.session_state.cart))
+                    
                     # Очищення кошика після успішного замовлення
                     st.session_state.cart = []
                     st.session_state.order_completed = True
@@ -891,6 +1208,11 @@ elif st.session_state.current_page == "cart":
                     navigate_to("orders")
                 else:
                     error_message(result.get("message", "Помилка при оформленні замовлення"))
+                    # Позиції, яких не вистачає на складі
+                    names = {item["product_id"]: item["name"] for item in st.session_state.cart}
+                    for shortfall in result.get("shortfalls", []):
+                        st.write(f"{names.get(shortfall['product_id'], shortfall['product_id'])}: "
+                                 f"замовлено {shortfall['requested']}, доступно {shortfall['available']}")
 
 elif st.session_state.current_page == "orders":
     # Перевірка автентифікації
@@ -906,7 +1228,8 @@ elif st.session_state.current_page == "orders":
             st.session_state.order_completed = False
         
         # Отримання історії замовлень
-        orders = get_order_history(st.session_state.token)
+        orders_pages = load_pages("orders_pages", get_order_history, token=st.session_state.token)
+        orders = orders_pages["items"]
         
         if not orders:
             info_message("У вас ще немає замовлень")
@@ -920,6 +1243,11 @@ elif st.session_state.current_page == "orders":
                     st.markdown("#### Товари в замовленні:")
                     for item in order.get('items', []):
                         st.markdown(f"- {item['product_name']} x {item['quantity']} шт. ({item['price_per_item']} грн за шт.)")
+            
+            # Завантаження наступної сторінки замовлень
+            if orders_pages["next_cursor"]:
+                st.button("Показати ще", key="orders_more", use_container_width=True,
+                          on_click=load_more_pages, args=("orders_pages", get_order_history))
 
 elif st.session_state.current_page == "profile":
     # Перевірка автентифікації
@@ -972,6 +1300,9 @@ elif st.session_state.current_page == "profile":
                         # Оновлення інформації в сесії
                         if "username" in update_data:
                             st.session_state.user['username'] = new_username
+                            # Ім'я показується у відгуках на сторінках товарів
+                            invalidate_products()
+                            invalidate_reviews()
                         
                         if "email" in update_data:
                             st.session_state.user['email'] = new_email
@@ -1015,9 +1346,6 @@ elif st.session_state.current_page == "chat":
     else:
         st.title("Чат з менеджером")
         
-        # Отримання повідомлень
-        chat_result = get_chat_messages(st.session_state.token)
-        
         # Ініціалізуємо форму для повідомлень
         with st.form(key="chat_form"):
             message = st.text_area("Текст повідомлення", key="message_text")
@@ -1030,43 +1358,49 @@ elif st.session_state.current_page == "chat":
                 else:
                     st.error(result.get("message", "Помилка при відправці повідомлення"))
         
-        # Відображення повідомлень
-        if chat_result.get("success"):
-            messages = chat_result.get("messages", [])
-            
-            if not messages:
-                info_message("У вас ще немає повідомлень. Напишіть першим!")
+        # Відображення повідомлень (оновлюється автоматично)
+        @st.fragment(run_every=CHAT_REFRESH_SECONDS)
+        def show_client_chat():
+            chat_result = load_chat()
             
-            else:
-                st.markdown("### Історія повідомлень")
-                for message in messages:
-                    is_client = message['sender_role'] == 'client'
-                    
-                    # Стилізація повідомлень
-                    if is_client:
-                        st.markdown(f"""
-                        <div style="text-align: right;">
-                            <div class="chat-client">
-                                <div><strong>Ви:</strong></div>
-                                <div>{message['message']}</div>
-                                <div><small>{message['timestamp'][:16].replace('T', ' ')}</small></div>
+            if chat_result.get("success"):
+                messages = chat_result.get("messages", [])
+                
+                if not messages:
+                    info_message("У вас ще немає повідомлень. Напишіть першим!")
+                
+                else:
+                    st.markdown("### Історія повідомлень")
+                    for message in messages:
+                        is_client = message['sender_role'] == 'client'
+                        
+                        # Стилізація повідомлень
+                        if is_client:
+                            st.markdown(f"""
+                            <div style="text-align: right;">
+                                <div class="chat-client">
+                                    <div><strong>Ви:</strong></div>
+                                    <div>{message['message']}</div>
+                                    <div><small>{message['timestamp'][:16].replace('T', ' ')}</small></div>
+                                </div>
                             </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        st.markdown(f"""
-                        <div style="text-align: left;">
-                            <div class="chat-manager">
-                                <div><strong>Менеджер:</strong></div>
-                                <div>{message['message']}</div>
-                                <div><small>{message['timestamp'][:16].replace('T', ' ')}</small></div>
+                            """, unsafe_allow_html=True)
+                        else:
+                            st.markdown(f"""
+                            <div style="text-align: left;">
+                                <div class="chat-manager">
+                                    <div><strong>Менеджер:</strong></div>
+                                    <div>{message['message']}</div>
+                                    <div><small>{message['timestamp'][:16].replace('T', ' ')}</small></div>
+                                </div>
                             </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-            
-            # Оновлення після відправки повідомлення
-            if st.session_state.message_sent:
-                st.session_state.message_sent = False
+                            """, unsafe_allow_html=True)
+        
+        show_client_chat()
+        
+        # Оновлення після відправки повідомлення
+        if st.session_state.message_sent:
+            st.session_state.message_sent = False
 
 elif st.session_state.current_page == "manager_chats":
     # Перевірка автентифікації
@@ -1076,76 +1410,86 @@ elif st.session_state.current_page == "manager_chats":
     else:
         st.title("Чати з клієнтами")
         
-        # Отримання списку клієнтів з повідомленнями
-        chat_result = get_chat_messages(st.session_state.token)
+        # Скринька: розмови з клієнтами від найновішої
+        def fetch_inbox_page(**filters):
+            return get_chat_inbox(st.session_state.token, **filters)
+        
+        if st.button("Оновити список чатів", key="inbox_refresh"):
+            st.session_state.pop("inbox_pages", None)
         
-        if chat_result.get("success") and "clients" in chat_result:
-            clients = chat_result.get("clients", [])
+        inbox_pages = load_pages("inbox_pages", fetch_inbox_page)
+        conversations = {conversation["user_id"]: conversation for conversation in inbox_pages["items"]}
+        
+        if not conversations:
+            info_message("Немає активних чатів з клієнтами")
+        else:
+            # Вибір клієнта: кількість непрочитаних та початок останнього повідомлення
+            def conversation_label(client_id):
+                if client_id is None:
+                    return "Виберіть клієнта..."
+                conversation = conversations[client_id]
+                unread = f" ({conversation['unread_count']} нових)" if conversation["unread_count"] else ""
+                return f"{conversation['username']}{unread} - {conversation['last_timestamp'][:16]}: {conversation['last_message'][:40]}"
             
-            if not clients:
-                info_message("Немає активних чатів з клієнтами")
-            else:
-                # Вибір клієнта
-                client_options = ["Виберіть клієнта..."] + [client["username"] for client in clients]
-                selected_client = st.selectbox("Клієнт", client_options)
+            client_id = st.selectbox("Клієнт", [None] + list(conversations), format_func=conversation_label, key="inbox_client")
+            
+            if inbox_pages["next_cursor"] and st.button("Показати ще", key="inbox_more"):
+                load_more_pages("inbox_pages", fetch_inbox_page)
+                st.rerun()
+            
+            # Показуємо чат з обраним клієнтом
+            if client_id:
+                selected_client = conversations[client_id]["username"]
+                st.session_state.chat_with_client = client_id
                 
-                if selected_client != "Виберіть клієнта...":
-                    # Знаходимо id обраного клієнта
-                    client_id = None
-                    for client in clients:
-                        if client["username"] == selected_client:
-                            client_id = client["user_id"]
-                            break
+                # Форма для відправки повідомлення
+                with st.form(key=f"manager_chat_form_{client_id}"):
+                    message = st.text_area("Текст повідомлення", key=f"manager_message_text_{client_id}")
+                    submit_button = st.form_submit_button(label="Відправити", use_container_width=True)
                     
-                    st.session_state.chat_with_client = client_id
+                    if submit_button and message:
+                        result = send_chat_message(message, st.session_state.token, client_id=client_id)
+                        if result.get("success"):
+                            st.rerun()
+                        else:
+                            st.error(result.get("message", "Помилка при відправці повідомлення"))
+                
+                # Відображення повідомлень обраного клієнта (оновлюється автоматично)
+                @st.fragment(run_every=CHAT_REFRESH_SECONDS)
+                def show_manager_chat(client_id, client_name):
+                    chat_messages = load_chat(client_id)
                     
-                    # Показуємо чат з обраним клієнтом
-                    if client_id:
-                        # Отримання повідомлень для обраного клієнта
-                        chat_messages = get_chat_messages(st.session_state.token, client_id=client_id)
+                    if chat_messages.get("success"):
+                        messages = chat_messages.get("messages", [])
                         
-                        # Форма для відправки повідомлення
-                        with st.form(key=f"manager_chat_form_{client_id}"):
-                            message = st.text_area("Текст повідомлення", key=f"manager_message_text_{client_id}")
-                            submit_button = st.form_submit_button(label="Відправити", use_container_width=True)
-                            
-                            if submit_button and message:
-                                result = send_chat_message(message, st.session_state.token, client_id=client_id)
-                                if result.get("success"):
-                                    st.rerun()
-                                else:
-                                    st.error(result.get("message", "Помилка при відправці повідомлення"))
-                        
-                        # Відображення повідомлень
-                        if chat_messages.get("success"):
-                            messages = chat_messages.get("messages", [])
-                            
-                            if messages:
-                                st.markdown("### Історія повідомлень")
-                                for message in messages:
-                                    is_manager = message['sender_role'] == 'manager'
-                                    
-                                    # Стилізація повідомлень
-                                    if is_manager:
-                                        st.markdown(f"""
-                                        <div style="text-align: right;">
-                                            <div class="chat-manager">
-                                                <div><strong>Ви:</strong></div>
-                                                <div>{message['message']}</div>
-                                                <div><small>{message['timestamp'][:16].replace('T', ' ')}</small></div>
-                                            </div>
+                        if messages:
+                            st.markdown("### Історія повідомлень")
+                            for message in messages:
+                                is_manager = message['sender_role'] == 'manager'
+                                
+                                # Стилізація повідомлень
+                                if is_manager:
+                                    st.markdown(f"""
+                                    <div style="text-align: right;">
+                                        <div class="chat-manager">
+                                            <div><strong>Ви:</strong></div>
+                                            <div>{message['message']}</div>
+                                            <div><small>{message['timestamp'][:16].replace('T', ' ')}</small></div>
                                         </div>
-                                        """, unsafe_allow_html=True)
-                                    else:
-                                        st.markdown(f"""
-                                        <div style="text-align: left;">
-                                            <div class="chat-client">
-                                                <div><strong>{selected_client}:</strong></div>
-                                                <div>{message['message']}</div>
-                                                <div><small>{message['timestamp'][:16].replace('T', ' ')}</small></div>
-                                            </div>
+                                    </div>
+                                    """, unsafe_allow_html=True)
+                                else:
+                                    st.markdown(f"""
+                                    <div style="text-align: left;">
+                                        <div class="chat-client">
+                                            <div><strong>{client_name}:</strong></div>
+                                            <div>{message['message']}</div>
+                                            <div><small>{message['timestamp'][:16].replace('T', ' ')}</small></div>
                                         </div>
-                                        """, unsafe_allow_html=True)
+                                    </div>
+                                    """, unsafe_allow_html=True)
+                
+                show_manager_chat(client_id, selected_client)
 
 elif st.session_state.current_page == "manage_products":
     # Перевірка автентифікації
@@ -1156,25 +1500,26 @@ elif st.session_state.current_page == "manage_products":
         st.title("Управління товарами")
         
         # Створення нового товару або редагування існуючого
-        tab1, tab2 = st.tabs(["Список товарів", "Додати новий товар"])
+        tab1, tab2, tab3 = st.tabs(["Список товарів", "Додати новий товар", "Імпорт та експорт"])
         
         with tab1:
-            # Отримання всіх товарів
-            products = get_products()
+            # Фільтрація за категоріями
+            categories = [{"id": None, "name": "Всі категорії"}] + get_categories()
+            category_names = [cat["name"] for cat in categories]
+            selected_filter = st.selectbox("Фільтр за категорією", category_names)
+            
+            filter_category_id = None
+            for cat in categories:
+                if cat["name"] == selected_filter:
+                    filter_category_id = cat["id"]
             
-            if not products:
+            # Отримання товарів обраної категорії
+            manage_pages = load_pages("manage_products_pages", get_products, category_id=filter_category_id)
+            filtered_products = manage_pages["items"]
+            
+            if not filtered_products:
                 info_message("Товари відсутні")
             else:
-                # Фільтрація за категоріями
-                categories = [{"id": None, "name": "Всі категорії"}] + get_categories()
-                category_names = [cat["name"] for cat in categories]
-                selected_filter = st.selectbox("Фільтр за категорією", category_names)
-                
-                # Фільтруємо товари за категорією
-                filtered_products = products
-                if selected_filter != "Всі категорії":
-                    filtered_products = [p for p in products if p.get('category_name') == selected_filter]
-                
                 # Відображення товарів з можливістю редагування та видалення
                 for product in filtered_products:
                     with st.expander(f"{product['name']} - {product['price']} грн"):
@@ -1210,7 +1555,8 @@ elif st.session_state.current_page == "manage_products":
                                         if result.get("success"):
                                             success_message(result.get("message", "Товар успішно видалено"))
                                             st.session_state.confirm_delete[f"confirm_delete_{product_id}"] = False
-                                            st.cache_data.clear()
+                                            invalidate_products(product_id)
+                                            reset_pages()
                                             st.rerun()
                                         else:
                                             error_message(result.get("message", "Помилка при видаленні товару"))
@@ -1224,6 +1570,11 @@ elif st.session_state.current_page == "manage_products":
                                              type="primary", help="Видалити товар"):
                                     st.session_state.confirm_delete[f"confirm_delete_{product_id}"] = True
                                     st.rerun()
+                
+                # Завантаження наступної сторінки товарів
+                if manage_pages["next_cursor"]:
+                    st.button("Показати ще", key="manage_products_more", use_container_width=True,
+                              on_click=load_more_pages, args=("manage_products_pages", get_products))
         
         with tab2:
             st.subheader("Додати новий товар")
@@ -1272,10 +1623,49 @@ elif st.session_state.current_page == "manage_products":
                     if result.get("success"):
                         success_message(result.get("message", "Товар успішно додано"))
                         # Очищення форми
-                        st.cache_data.clear()
+                        invalidate_products()
+                        reset_pages()
                         st.rerun()
                     else:
                         error_message(result.get("message", "Помилка при додаванні товару"))
+        
+        with tab3:
+            st.subheader("Імпорт товарів")
+            st.markdown("Файл CSV або JSON Lines зі стовпцями id, name, description, price, quantity, "
+                        "category_id або category (назва категорії), image_url. Рядки з id існуючого товару "
+                        "оновлюють його, решта додаються як нові товари.")
+            
+            uploaded_file = st.file_uploader("Файл товарів", type=["csv", "jsonl"])
+            dry_run = st.checkbox("Лише перевірити файл, без змін у каталозі")
+            
+            if uploaded_file is not None and st.button("Імпортувати", use_container_width=True):
+                file_format = "jsonl" if uploaded_file.name.endswith(".jsonl") else "csv"
+                result = import_products(uploaded_file, file_format, st.session_state.token, dry_run=dry_run)
+                
+                if result.get("success"):
+                    if dry_run:
+                        success_message(f"Помилок немає. Буде додано товарів: {result['inserted']}, "
+                                        f"оновлено: {result['updated']}")
+                    else:
+                        success_message(f"Нових товарів: {result['inserted']}, оновлених: {result['updated']}")
+                        invalidate_products()
+                        reset_pages()
+                else:
+                    # Файл з помилками не імпортується навіть частково
+                    error_message(result.get("message", "Помилка при імпорті товарів"))
+                    if result.get("errors"):
+                        st.dataframe([{"Рядок": error["row"], "Помилка": error["message"]} for error in result["errors"]],
+                                     use_container_width=True)
+            
+            st.subheader("Експорт товарів")
+            export_format = st.radio("Формат", ["csv", "jsonl"], horizontal=True)
+            if st.button("Підготувати файл", use_container_width=True):
+                st.session_state.products_export = (export_format, export_products(export_format, st.session_state.token))
+            
+            if st.session_state.get("products_export") and st.session_state.products_export[1] is not None:
+                file_format, data = st.session_state.products_export
+                st.download_button("Завантажити", data=data, file_name=f"products.{file_format}",
+                                   use_container_width=True)
 
 elif st.session_state.current_page == "edit_product":
     # Перевірка автентифікації та наявності товару для редагування
@@ -1354,6 +1744,7 @@ elif st.session_state.current_page == "edit_product":
                 
                 if result.get("success"):
                     success_message(result.get("message", "Товар успішно оновлено"))
+                    invalidate_products(product['id'])
                     # Повернення до списку товарів
                     st.session_state.edit_product = None
                     navigate_to("manage_products")
@@ -1397,7 +1788,9 @@ elif st.session_state.current_page == "manage_categories":
                                 
                                 if result.get("success"):
                                     success_message(result.get("message", "Категорія успішно оновлена"))
-                                    st.cache_data.clear()
+                                    invalidate_categories()
+                                    invalidate_products()
+                                    reset_pages()
                                     st.rerun()
                                 else:
                                     error_message(result.get("message", "Помилка при оновленні категорії"))
@@ -1416,7 +1809,9 @@ elif st.session_state.current_page == "manage_categories":
                                         if result.get("success"):
                                             success_message(result.get("message", "Категорія успішно видалена"))
                                             st.session_state.confirm_delete[f"confirm_delete_cat_{category_id}"] = False
-                                            st.cache_data.clear()
+                                            invalidate_categories()
+                                            invalidate_products()
+                                            reset_pages()
                                             st.rerun()
                                         else:
                                             error_message(result.get("message", "Помилка при видаленні категорії"))
@@ -1446,7 +1841,8 @@ elif st.session_state.current_page == "manage_categories":
                     if result.get("success"):
                         success_message(result.get("message", "Категорія успішно додана"))
                         # Очищення форми
-                        st.cache_data.clear()
+                        invalidate_categories()
+                        reset_pages()
                         st.rerun()
                     else:
                         error_message(result.get("message", "Помилка при додаванні категорії"))
@@ -1459,41 +1855,51 @@ elif st.session_state.current_page == "manage_orders":
     else:
         st.title("Управління замовленнями")
         
-        # Отримання всіх замовлень
-        orders = get_order_history(st.session_state.token)
+        tab1, tab2 = st.tabs(["Список замовлень", "Аналітика продажів"])
         
-        if not orders:
-            info_message("Замовлення відсутні")
-        else:
-            # Фільтрація за статусом
+        with tab1:
+            # Фільтрація за статусом та періодом
             status_options = ["Всі статуси", "Обробляється", "Підтверджено", "Відправлено", "Доставлено", "Скасовано"]
-            selected_status = st.selectbox("Фільтр за статусом", status_options)
-            
-            filtered_orders = orders
-            if selected_status != "Всі статуси":
-                filtered_orders = [order for order in orders if order['status'] == selected_status]
-            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                selected_status = st.selectbox("Фільтр за статусом", status_options)
+            with col2:
+                date_from = st.date_input("Дата від", value=None, format="DD.MM.YYYY")
+            with col3:
+                date_to = st.date_input("Дата до", value=None, format="DD.MM.YYYY")
+        
+            # Отримання замовлень з фільтрами на сервері
+            manage_orders_pages = load_pages(
+                "manage_orders_pages",
+                get_order_history,
+                token=st.session_state.token,
+                status=selected_status if selected_status != "Всі статуси" else None,
+                date_from=date_from.isoformat() if date_from else None,
+                date_to=date_to.isoformat() if date_to else None
+            )
+            filtered_orders = manage_orders_pages["items"]
+        
             if not filtered_orders:
-                info_message(f"Немає замовлень зі статусом '{selected_status}'")
+                info_message("Замовлення відсутні")
             else:
                 # Відображення замовлень у вигляді таблиці
-                st.subheader(f"Знайдено замовлень: {len(filtered_orders)}")
-                
+                st.subheader(f"Показано замовлень: {len(filtered_orders)}")
+            
                 # Відображення замовлень
                 for order in filtered_orders:
                     with st.expander(f"Замовлення #{order['id']} - {order.get('username', 'Користувач')} - {order['status']}"):
                         col1, col2 = st.columns([3, 1])
-                        
+                    
                         with col1:
                             st.markdown(f"**Клієнт:** {order.get('username', 'Невідомий')}")
                             st.markdown(f"**Дата замовлення:** {order['order_date'][:10]}")
                             st.markdown(f"**Загальна сума:** {order['total_price']} грн")
-                            
+                        
                             # Відображення товарів у замовленні
                             st.markdown("#### Товари в замовленні:")
                             for item in order.get('items', []):
                                 st.markdown(f"- {item['product_name']} x {item['quantity']} шт. ({item['price_per_item']} грн за шт.)")
-                        
+                    
                         with col2:
                             # Форма для оновлення статусу
                             new_status = st.selectbox(
@@ -1502,16 +1908,70 @@ elif st.session_state.current_page == "manage_orders":
                                 index=status_options.index(order['status']) - 1 if order['status'] in status_options[1:] else 0,
                                 key=f"status_{order['id']}"
                             )
-                            
+                        
                             if st.button("Оновити статус", key=f"update_status_{order['id']}", use_container_width=True):
                                 result = update_order_status(order['id'], new_status, st.session_state.token)
-                                
+                            
                                 if result.get("success"):
                                     success_message(result.get("message", "Статус замовлення успішно оновлено"))
-                                    st.cache_data.clear()
+                                    reset_pages()
                                     st.rerun()
                                 else:
                                     error_message(result.get("message", "Помилка при оновленні статусу замовлення"))
+            
+                # Завантаження наступної сторінки замовлень
+                if manage_orders_pages["next_cursor"]:
+                    st.button("Показати ще", key="manage_orders_more", use_container_width=True,
+                              on_click=load_more_pages, args=("manage_orders_pages", get_order_history))
+        
+        with tab2:
+            # Період звіту (без дат - останні 30 днів)
+            col1, col2 = st.columns(2)
+            with col1:
+                analytics_from = st.date_input("Дата від", value=None, format="DD.MM.YYYY", key="analytics_from")
+            with col2:
+                analytics_to = st.date_input("Дата до", value=None, format="DD.MM.YYYY", key="analytics_to")
+            
+            analytics = get_sales_analytics(
+                st.session_state.token,
+                date_from=analytics_from.isoformat() if analytics_from else None,
+                date_to=analytics_to.isoformat() if analytics_to else None
+            )
+            
+            if not analytics.get("success"):
+                error_message(analytics.get("message", "Помилка при отриманні аналітики"))
+            else:
+                st.markdown(f"Період: {analytics['date_from']} - {analytics['date_to']} (без скасованих замовлень)")
+                
+                totals = analytics["totals"]
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Виручка, грн", f"{totals['revenue']:.2f}")
+                col2.metric("Продано одиниць", totals["units"])
+                col3.metric("Замовлень", totals["orders_count"])
+                
+                if not analytics["daily"]:
+                    info_message("За обраний період продажів немає")
+                else:
+                    st.markdown("#### Виручка по днях")
+                    st.bar_chart([{"Дата": day["day"], "Виручка": day["revenue"]} for day in analytics["daily"]],
+                                 x="Дата", y="Виручка")
+                    
+                    st.markdown("#### Найкращі товари")
+                    st.dataframe([{"Товар": product["name"] or f"Видалений товар #{product['product_id']}",
+                                   "Продано": product["units"], "Замовлень": product["orders_count"],
+                                   "Виручка, грн": product["revenue"]} for product in analytics["top_products"]],
+                                 use_container_width=True, hide_index=True)
+                    
+                    st.markdown("#### Категорії")
+                    st.dataframe([{"Категорія": category["name"] or "Без категорії",
+                                   "Продано": category["units"], "Виручка, грн": category["revenue"]}
+                                  for category in analytics["categories"]],
+                                 use_container_width=True, hide_index=True)
+
+# Кількість запитів до API з попереднього перезапуску (разом з обробниками кнопок
+# та оновленнями фрагментів між ними); відповіді з кешу не рахуються
+api_calls_placeholder.caption(f"Запитів до API за перезапуск: {st.session_state.get('api_calls', 0)}")
+st.session_state.api_calls = 0
 
 # Запуск додатку
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+﻿# compression.py
+import gzip
+import os
+
+# brotli - необов'язкова залежність (pip install brotli); без неї доступний лише gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Налаштування стиснення (можна перевизначити змінними оточення)
+COMPRESSION_MIN_SIZE = int(os.environ.get('ROBOTICS_SHOP_COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('ROBOTICS_SHOP_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('ROBOTICS_SHOP_BROTLI_QUALITY', '5'))
+
+# Підтримувані кодування в порядку переваги
+ENCODINGS = (["br"] if brotli else []) + ["gzip"]
+
+
+# Найкраще кодування, яке приймає клієнт (request.accept_encodings), або None
+def choose_encoding(accept_encodings):
+    for encoding in ENCODINGS:
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# Тіло відповіді без кодування Content-Encoding (None - тіло не стиснене)
+def decompress(data, encoding):
+    if encoding == "br":
+        return brotli.decompress(data)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    return data
+
+
+# Стиснене тіло - інше представлення ресурсу, тому воно отримує власний ETag
+def encoded_etag(etag, encoding):
+    return f"{etag}-{encoding}"
+
+
+# ETag ресурсу та всіх його стиснених варіантів (для перевірки If-None-Match)
+def etag_variants(etag):
+    return [etag] + [encoded_etag(etag, encoding) for encoding in ENCODINGS]
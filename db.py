@@ -0,0 +1,302 @@
+﻿# db.py
+import sqlite3
+import threading
+import queue
+import time
+import os
+from contextlib import contextmanager
+
+# Налаштування бази даних (можна перевизначити змінними оточення)
+DB_PATH = os.environ.get('ROBOTICS_SHOP_DB', 'robotics_shop.db')
+POOL_SIZE = int(os.environ.get('ROBOTICS_SHOP_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.environ.get('ROBOTICS_SHOP_POOL_TIMEOUT', '5'))
+STORAGE_PROFILE = os.environ.get('ROBOTICS_SHOP_STORAGE_PROFILE', 'development')
+
+# Профілі зберігання: PRAGMA, які застосовуються до кожного нового з'єднання.
+# legacy - типові налаштування SQLite (журнал відкату, без очікування блокування),
+# залишений для порівняння; development та production - журнал WAL, у якому
+# читання не блокуються записом, а записи чекають звільнення блокування busy_timeout мс.
+# cache_size від'ємний - розмір у КіБ, mmap_size - у байтах.
+STORAGE_PROFILES = {
+    "legacy": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "busy_timeout": 0,
+    },
+    "development": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "busy_timeout": 5000,
+    },
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "busy_timeout": 10000,
+    },
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Застосування профілю зберігання до з'єднання
+def apply_storage_profile(conn, profile=STORAGE_PROFILE):
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Невідомий профіль зберігання: {profile}")
+
+    # busy_timeout першим, щоб зміна режиму журналу теж чекала на блокування
+    settings = STORAGE_PROFILES[profile]
+    conn.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout'])}")
+    conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(settings['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings['mmap_size'])}")
+
+
+# Нове з'єднання з базою даних з налаштуваннями профілю (сервер, seed.py, бенчмарки)
+def connect(path=DB_PATH, profile=STORAGE_PROFILE, check_same_thread=True):
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    apply_storage_profile(conn, profile)
+    return conn
+
+
+# Пул з'єднань SQLite, спільний для всіх потоків сервера
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT, profile=STORAGE_PROFILE):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.profile = profile
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._created = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "reentrant": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+        }
+
+    def _connect(self):
+        return connect(self.path, self.profile, check_same_thread=False)
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def acquire(self):
+        # Повторне використання з'єднання, яке вже тримає цей потік
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            self._count("reentrant")
+            return held
+
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+            self._count("hits")
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                self._count("misses")
+
+        # Пул вичерпано - чекаємо, поки інший потік поверне з'єднання
+        if conn is None:
+            started = time.perf_counter()
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                self._count("timeouts")
+                raise PoolTimeout("Немає вільних з'єднань з базою даних")
+            waited = time.perf_counter() - started
+            with self._lock:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += waited
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+
+        conn.row_factory = None
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        if getattr(self._local, 'conn', None) is conn:
+            self._local.depth -= 1
+            if self._local.depth > 0:
+                return
+            self._local.conn = None
+
+        # Незавершена транзакція (наприклад, після помилки) відкочується
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+        stats["storage_profile"] = self.profile
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["open"] - stats["idle"]
+        requests_total = stats["hits"] + stats["misses"] + stats["waits"]
+        stats["hit_ratio"] = (stats["hits"] + stats["waits"]) / requests_total if requests_total else 0
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["waits"] if stats["waits"] else 0
+        return stats
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+pool = ConnectionPool()
+
+
+# Отримання з'єднання з пулу; з'єднання повертається в пул на будь-якому шляху виходу
+def get_db():
+    return pool.connection()
+
+
+# Зведені рейтинги товарів (сума, кількість та гістограма оцінок)
+RATING_COLUMNS = ", ".join(f"rating_{value}" for value in range(1, 6))
+
+
+# Заміна старої оцінки на нову у зведенні товару (None - оцінки немає)
+def apply_review_rating(cursor, product_id, old_rating=None, new_rating=None):
+    histogram = {value: 0 for value in range(1, 6)}
+    if old_rating is not None:
+        histogram[old_rating] -= 1
+    if new_rating is not None:
+        histogram[new_rating] += 1
+
+    sum_delta = (new_rating or 0) - (old_rating or 0)
+    count_delta = (new_rating is not None) - (old_rating is not None)
+
+    cursor.execute("INSERT OR IGNORE INTO product_ratings (product_id) VALUES (?)", (product_id,))
+    cursor.execute(f"""
+        UPDATE product_ratings
+        SET rating_sum = rating_sum + ?, rating_count = rating_count + ?,
+            {", ".join(f"rating_{value} = rating_{value} + ?" for value in range(1, 6))}
+        WHERE product_id = ?
+    """, (sum_delta, count_delta, *histogram.values(), product_id))
+
+
+# Повний перерахунок зведених рейтингів з таблиці відгуків (фіксацію робить викликач)
+def rebuild_product_ratings(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM product_ratings")
+    cursor.execute(f"""
+        INSERT INTO product_ratings (product_id, rating_sum, rating_count, {RATING_COLUMNS})
+        SELECT r.product_id, SUM(r.rating), COUNT(r.id),
+               {", ".join(f"SUM(r.rating = {value})" for value in range(1, 6))}
+        FROM reviews r
+        JOIN products p ON r.product_id = p.id
+        JOIN users u ON r.user_id = u.id
+        GROUP BY r.product_id
+    """)
+    return cursor.rowcount
+
+# Денні підсумки продажів: sales_daily - по днях, sales_daily_products - по днях і товарах.
+# Скасовані замовлення до підсумків не входять.
+CANCELLED_STATUS = 'Скасовано'
+
+
+# Додавання (sign = 1) або віднімання (sign = -1) замовлення в денних підсумках (фіксацію робить викликач)
+def apply_order_sales(cursor, order_id, sign):
+    cursor.execute("""
+        SELECT date(o.order_date), COALESCE(SUM(oi.quantity), 0), COALESCE(SUM(oi.quantity * oi.price_per_item), 0)
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.id = ?
+        GROUP BY o.id
+    """, (order_id,))
+    day, units, revenue = cursor.fetchone()
+
+    cursor.execute("""
+        INSERT INTO sales_daily (day, orders_count, units, revenue) VALUES (?, ?, ?, ?)
+        ON CONFLICT (day) DO UPDATE SET
+            orders_count = orders_count + excluded.orders_count,
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue
+    """, (day, sign, sign * units, sign * revenue))
+    cursor.execute("""
+        INSERT INTO sales_daily_products (day, product_id, category_id, orders_count, units, revenue)
+        SELECT ?, oi.product_id, p.category_id, ?, ? * oi.quantity, ? * oi.quantity * oi.price_per_item
+        FROM order_items oi
+        LEFT JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = ?
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            orders_count = orders_count + excluded.orders_count,
+            units = units + excluded.units,
+            revenue = revenue + excluded.revenue
+    """, (day, sign, sign, sign, order_id))
+
+
+# Повний перерахунок денних підсумків з таблиць замовлень (фіксацію робить викликач)
+def rebuild_sales_rollup(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM sales_daily")
+    cursor.execute("DELETE FROM sales_daily_products")
+    cursor.execute("""
+        INSERT INTO sales_daily (day, orders_count, units, revenue)
+        SELECT date(o.order_date), COUNT(DISTINCT o.id),
+               COALESCE(SUM(oi.quantity), 0), COALESCE(SUM(oi.quantity * oi.price_per_item), 0)
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.status != ?
+        GROUP BY date(o.order_date)
+    """, (CANCELLED_STATUS,))
+    days_count = cursor.rowcount
+    cursor.execute("""
+        INSERT INTO sales_daily_products (day, product_id, category_id, orders_count, units, revenue)
+        SELECT date(o.order_date), oi.product_id, p.category_id, COUNT(DISTINCT o.id),
+               SUM(oi.quantity), SUM(oi.quantity * oi.price_per_item)
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.id
+        LEFT JOIN products p ON p.id = oi.product_id
+        WHERE o.status != ?
+        GROUP BY date(o.order_date), oi.product_id
+    """, (CANCELLED_STATUS,))
+    return days_count
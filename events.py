@@ -0,0 +1,41 @@
+﻿# events.py
+import threading
+from collections import OrderedDict
+
+# Кількість розмов, для яких пам'ятається останнє повідомлення; найдавніше оновлені
+# витісняються, і очікування в них завершується повторною перевіркою бази даних
+CHAT_NOTIFIER_MAX_CLIENTS = 10000
+
+
+# Сповіщення про нові повідомлення чату для довгого опитування.
+# Працює в межах процесу; зміни з інших процесів помічаються повторною
+# перевіркою бази даних після кожного інтервалу очікування.
+class ChatNotifier:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._latest = OrderedDict()
+        self._listeners = []
+
+    # Додаткові отримувачі сповіщень (наприклад, цикл подій asgi.py);
+    # викликаються з потоку, що зберіг повідомлення
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # Нове повідомлення в розмові клієнта client_id
+    def publish(self, client_id, message_id):
+        with self._condition:
+            self._latest[client_id] = max(message_id, self._latest.get(client_id, 0))
+            self._latest.move_to_end(client_id)
+            if len(self._latest) > CHAT_NOTIFIER_MAX_CLIENTS:
+                self._latest.popitem(last=False)
+            self._condition.notify_all()
+        for callback in self._listeners:
+            callback(client_id, message_id)
+
+    # Очікування повідомлення з id більшим за since_id; True, якщо воно з'явилося
+    def wait(self, client_id, since_id, timeout):
+        with self._condition:
+            return self._condition.wait_for(lambda: self._latest.get(client_id, 0) > since_id, timeout)
+
+
+chat_notifier = ChatNotifier()
@@ -0,0 +1,24 @@
+﻿# gunicorn.conf.py
+# Налаштування gunicorn для робочого режиму: gunicorn -c gunicorn.conf.py wsgi:app
+from wsgi import HOST, PORT, WORKERS, THREADS, SHUTDOWN_TIMEOUT
+from db import pool
+
+bind = f"{HOST}:{PORT}"
+workers = WORKERS
+threads = THREADS
+worker_class = 'gthread'
+graceful_timeout = int(SHUTDOWN_TIMEOUT)
+
+# Застосунок (міграції та SECRET_KEY) завантажується один раз у головному процесі,
+# тому токени, видані одним робочим процесом, приймаються всіма іншими
+preload_app = True
+
+
+# З'єднання SQLite не можна передавати через fork: головний процес закриває свої
+# перед запуском кожного робочого процесу, робочі процеси відкривають власні
+def pre_fork(server, worker):
+    pool.close_all()
+
+
+def worker_exit(server, worker):
+    pool.close_all()
@@ -1,44 +1,43 @@
 ﻿# fill_database.py
-import sqlite3
+# Заповнення бази даних детермінованими тестовими даними.
+# Спочатку додаються фіксовані менеджери, клієнти, категорії та товари (облікові
+# записи з README), далі - згенеровані до потрібної кількості. Популярність товарів
+# і активність клієнтів мають розподіл Зіпфа, тому невелика частина товарів отримує
+# більшість замовлень і відгуків. Однакові параметри дають однакову базу даних:
+# період даних закінчується фіксованою датою DEFAULT_END_DATE, а не сьогоднішньою
+# (--end-date today зсуває дані до поточної дати, але тоді база залежить від дня запуску).
+#   python seed.py [--users N] [--products N] [--orders N] [--reviews N] [--messages N]
+#                  [--seed N] [--days N] [--end-date РРРР-ММ-ДД|today] [--skew S] [--db шлях]
+import argparse
 import hashlib
 import random
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
 
-# Функція для хешування паролів
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+import db
+from db import connect, rebuild_product_ratings, rebuild_sales_rollup
 
-# Підключення до бази даних
-conn = sqlite3.connect('robotics_shop.db')
-cursor = conn.cursor()
+# Кількість рядків в одному executemany; фіксація - після кожної пачки замовлень
+BATCH_SIZE = 50000
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-# Очищення існуючих даних
-cursor.execute("DELETE FROM chat_messages")
-cursor.execute("DELETE FROM reviews")
-cursor.execute("DELETE FROM order_items")
-cursor.execute("DELETE FROM orders")
-cursor.execute("DELETE FROM products")
-cursor.execute("DELETE FROM categories")
-cursor.execute("DELETE FROM users")
+# Останній день періоду даних за замовчуванням
+DEFAULT_END_DATE = date(2026, 1, 1)
 
-print("База даних очищена. Починаємо заповнення...")
+# Показник розподілу Зіпфа для популярності клієнтів і товарів
+DEFAULT_SKEW = 1.0
+
+# Функція для хешування паролів
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
 
-# Додавання менеджерів
-managers = [
+# Менеджери та клієнти з відомими паролями
+MANAGERS = [
     ("admin", "admin@robotics.com", "admin123"),
     ("manager", "manager@robotics.com", "manager123")
 ]
 
-for username, email, password in managers:
-    hashed_password = hash_password(password)
-    cursor.execute(
-        "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
-        (username, email, hashed_password, "manager")
-    )
-    print(f"Доданий менеджер: {username}")
-
-# Додавання клієнтів
-clients = [
+CLIENTS = [
     ("oleksandr", "oleksandr@example.com", "password123"),
     ("mariya", "mariya@example.com", "password123"),
     ("ivan", "ivan@example.com", "password123"),
@@ -51,16 +50,10 @@ clients = [
     ("tetyana", "tetyana@example.com", "password123")
 ]
 
-for username, email, password in clients:
-    hashed_password = hash_password(password)
-    cursor.execute(
-        "INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)",
-        (username, email, hashed_password, "client")
-    )
-    print(f"Доданий клієнт: {username}")
+# Пароль згенерованих клієнтів (clientN / password123)
+GENERATED_PASSWORD = "password123"
 
-# Додавання категорій
-categories = [
+CATEGORIES = [
     ("Мікроконтролери", "Різноманітні мікроконтролери та плати розробника"),
     ("Сенсори", "Датчики та сенсори для робототехнічних проектів"),
     ("Двигуни і приводи", "Мотори, сервоприводи та інші компоненти руху"),
@@ -68,18 +61,8 @@ categories = [
     ("Інструменти", "Інструменти для створення та обслуговування проектів")
 ]
 
-category_ids = {}
-for name, description in categories:
-    cursor.execute(
-        "INSERT INTO categories (name, description) VALUES (?, ?)",
-        (name, description)
-    )
-    category_id = cursor.lastrowid
-    category_ids[name] = category_id
-    print(f"Додана категорія: {name}")
-
-# Додавання товарів
-products = [
+# Фіксовані товари; згенеровані товари - їхні варіанти з іншою ціною та залишком
+PRODUCTS = [
     # Мікроконтролери
     ("Arduino Uno R3", "Класична плата Arduino на базі ATmega328P мікроконтролера. Відмінна для початківців.", 250.00, 20, "Мікроконтролери", "https://content.arduino.cc/assets/UNO-TH_front.jpg"),
     ("Arduino Nano", "Компактна версія Arduino Uno з такими ж можливостями.", 180.00, 15, "Мікроконтролери", "https://store-cdn.arduino.cc/uni/catalog/product/cache/1/image/1000x750/f8876a31b63532bbba4e781c30024a0a/a/0/a000005_front_4_1.jpg"),
@@ -126,171 +109,311 @@ products = [
     ("Набір дротів для макетування", "Комплект дротів різних кольорів для з'єднання компонентів.", 65.00, 40, "Інструменти", "https://m.media-amazon.com/images/I/61H9yqfKkJL._AC_SL1000_.jpg")
 ]
 
-for name, description, price, quantity, category_name, image_url in products:
-    cursor.execute(
-        "INSERT INTO products (name, description, price, quantity, category_id, image_url) VALUES (?, ?, ?, ?, ?, ?)",
-        (name, description, price, quantity, category_ids[category_name], image_url)
+# Статуси замовлень залежно від давності: нові ще обробляються, старі здебільшого доставлені
+RECENT_STATUSES = (["Обробляється", "Підтверджено"], [60, 40])
+SHIPPING_STATUSES = (["Підтверджено", "Відправлено", "Доставлено", "Скасовано"], [15, 50, 30, 5])
+FINAL_STATUSES = (["Доставлено", "Скасовано"], [93, 7])
+
+REVIEW_COMMENTS = [
+    "Дуже задоволений покупкою, рекомендую!",
+    "Хороша якість за свою ціну.",
+    "Працює, як очікувалося. Швидка доставка.",
+    "Не зовсім те, що я очікував, але загалом непогано.",
+    "Чудовий продукт, вже замовив ще один.",
+    "Трохи дорого, але якість відповідає ціні.",
+    "Було кілька проблем на початку, але все вирішилося.",
+    "Ідеально підійшло для мого проекту.",
+    "Не працювало спочатку, але техпідтримка допомогла вирішити проблему.",
+    "Повністю задоволений, буду звертатися ще.",
+    "",  # Порожній коментар (тільки оцінка)
+]
+
+CLIENT_MESSAGES = [
+    "Добрий день, коли очікувати поставку мого замовлення?",
+    "Підкажіть, будь ласка, чи є у вас в наявності Arduino Mega?",
+    "Дякую за відповідь!",
+    "Я хотів би дізнатись більше про ваші сервоприводи.",
+    "Чи можна повернути товар, якщо він мені не підійде?",
+    "Коли буде знижка на мікроконтролери?",
+    "У мене виникла проблема з модулем WiFi, що мені робити?",
+    "Скільки часу триватиме доставка до Львова?",
+    "Чи є у вас запчастини для 3D-принтерів?",
+    "Мені потрібна консультація щодо вибору датчиків для мого проекту."
+]
+
+MANAGER_MESSAGES = [
+    "Доброго дня! Чим можу допомогти?",
+    "Так, звичайно. Ваше замовлення буде доставлено протягом 2-3 днів.",
+    "Так, Arduino Mega є в наявності, можете оформити замовлення на сайті.",
+    "Будь ласка! Якщо виникнуть ще питання, звертайтеся.",
+    "У нас є широкий вибір сервоприводів. Що саме вас цікавить?",
+    "Так, повернення можливе протягом 14 днів з моменту отримання товару.",
+    "Знижки на мікроконтролери плануються наступного місяця, слідкуйте за оновленнями.",
+    "Будь ласка, опишіть проблему детальніше, і ми спробуємо допомогти.",
+    "Доставка до Львова зазвичай займає 1-2 дні при наявності товару на складі.",
+    "Так, у нас є різні запчастини для 3D-принтерів. Які саме вас цікавлять?"
+]
+
+
+# Накопичені ваги розподілу Зіпфа для count елементів (для random.choices).
+# Ранги перемішуються, щоб популярними були не лише перші id.
+def zipf_cum_weights(rnd, count, skew):
+    ranks = list(range(1, count + 1))
+    rnd.shuffle(ranks)
+    cum_weights = []
+    total = 0.0
+    for rank in ranks:
+        total += 1.0 / rank ** skew
+        cum_weights.append(total)
+    return cum_weights
+
+
+# Ваги популярності товарів (у порядку id) мають окремий генератор від seed, тому
+# benchmarks/load_test.py відтворює їх за тим самим seed, не генеруючи базу заново
+def product_popularity(seed, products_count, skew=DEFAULT_SKEW):
+    return zipf_cum_weights(random.Random(f"products-{seed}"), products_count, skew)
+
+
+# Дата, рівномірно розподілена в межах періоду; зростає разом з index,
+# тому id замовлень і повідомлень упорядковані за часом, як у робочій базі
+def spread_date(rnd, start, span_seconds, index, count):
+    return start + timedelta(seconds=int((index + rnd.random()) * span_seconds / count))
+
+
+# Видалення існуючих даних та скидання лічильників id
+def clear_database(cursor):
+    tables = ["product_ratings", "sales_daily", "sales_daily_products", "chat_messages", "reviews",
+              "order_items", "orders", "products", "categories", "users"]
+    for table in tables:
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.execute(f"DELETE FROM sqlite_sequence WHERE name IN ({', '.join('?' for _ in tables)})", tables)
+
+
+# Менеджери, фіксовані та згенеровані клієнти; повертає (id менеджерів, id клієнтів)
+def insert_users(cursor, users_count):
+    generated_password = hash_password(GENERATED_PASSWORD)
+    users = [(username, email, hash_password(password), "manager") for username, email, password in MANAGERS]
+    users += [(username, email, hash_password(password), "client") for username, email, password in CLIENTS[:users_count]]
+    users += [(f"client{index}", f"client{index}@example.com", generated_password, "client")
+              for index in range(len(CLIENTS) + 1, users_count + 1)]
+
+    cursor.executemany(
+        "INSERT INTO users (id, username, email, password, role) VALUES (?, ?, ?, ?, ?)",
+        [(user_id, *user) for user_id, user in enumerate(users, 1)]
     )
-    print(f"Доданий товар: {name}")
-
-# Отримання ID користувачів (клієнтів)
-cursor.execute("SELECT id FROM users WHERE role = 'client'")
-client_ids = [row[0] for row in cursor.fetchall()]
-
-# Отримання ID товарів
-cursor.execute("SELECT id FROM products")
-product_ids = [row[0] for row in cursor.fetchall()]
-
-# Створення замовлень
-orders_count = 25  # Створимо 25 замовлень
-for _ in range(orders_count):
-    # Випадковий клієнт
-    client_id = random.choice(client_ids)
-    
-    # Випадкова дата (за останні 60 днів)
-    days_ago = random.randint(0, 60)
-    order_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Випадковий статус
-    status = random.choice(["Обробляється", "Підтверджено", "Відправлено", "Доставлено", "Скасовано"])
-    
-    # Створення замовлення
-    cursor.execute(
-        "INSERT INTO orders (user_id, order_date, status, total_price) VALUES (?, ?, ?, ?)",
-        (client_id, order_date, status, 0)  # Загальну ціну оновимо після додавання товарів
+    manager_ids = list(range(1, len(MANAGERS) + 1))
+    client_ids = list(range(len(MANAGERS) + 1, len(users) + 1))
+    return manager_ids, client_ids
+
+
+# Категорії, фіксовані товари та їхні варіанти; повертає список (id, ціна)
+def insert_products(cursor, rnd, products_count):
+    cursor.executemany(
+        "INSERT INTO categories (id, name, description) VALUES (?, ?, ?)",
+        [(category_id, name, description) for category_id, (name, description) in enumerate(CATEGORIES, 1)]
     )
-    order_id = cursor.lastrowid
-    
-    # Додавання випадкової кількості товарів до замовлення (1-5 товарів)
-    items_count = random.randint(1, 5)
-    selected_products = random.sample(product_ids, items_count)
-    total_price = 0
-    
-    for product_id in selected_products:
-        # Отримання інформації про товар
-        cursor.execute("SELECT price FROM products WHERE id = ?", (product_id,))
-        product_price = cursor.fetchone()[0]
-        
-        # Випадкова кількість (1-3 одиниці)
-        quantity = random.randint(1, 3)
-        
-        # Додавання товару до замовлення
-        cursor.execute(
-            "INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)",
-            (order_id, product_id, quantity, product_price)
+    category_ids = {name: category_id for category_id, (name, _) in enumerate(CATEGORIES, 1)}
+
+    products = []
+    for index in range(products_count):
+        name, description, price, quantity, category_name, image_url = PRODUCTS[index % len(PRODUCTS)]
+        if index >= len(PRODUCTS):
+            name = f"{name} (варіант {index // len(PRODUCTS)})"
+            price = round(price * rnd.uniform(0.7, 1.5), 2)
+            quantity = rnd.randint(0, 100)
+        products.append((index + 1, name, description, price, quantity, category_ids[category_name], image_url))
+
+    for batch_start in range(0, len(products), BATCH_SIZE):
+        cursor.executemany(
+            "INSERT INTO products (id, name, description, price, quantity, category_id, image_url) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            products[batch_start:batch_start + BATCH_SIZE]
         )
-        
-        total_price += product_price * quantity
-    
-    # Оновлення загальної ціни замовлення
-    cursor.execute("UPDATE orders SET total_price = ? WHERE id = ?", (total_price, order_id))
-    
-    print(f"Створено замовлення #{order_id} на суму {total_price} грн")
-
-# Додавання відгуків
-reviews_count = 80  # Створимо 80 відгуків
-for _ in range(reviews_count):
-    # Випадковий клієнт
-    client_id = random.choice(client_ids)
-    
-    # Випадковий товар
-    product_id = random.choice(product_ids)
-    
-    # Випадкова оцінка (1-5)
-    rating = random.randint(1, 5)
-    
-    # Випадкові коментарі
-    comments = [
-        "Дуже задоволений покупкою, рекомендую!",
-        "Хороша якість за свою ціну.",
-        "Працює, як очікувалося. Швидка доставка.",
-        "Не зовсім те, що я очікував, але загалом непогано.",
-        "Чудовий продукт, вже замовив ще один.",
-        "Трохи дорого, але якість відповідає ціні.",
-        "Було кілька проблем на початку, але все вирішилося.",
-        "Ідеально підійшло для мого проекту.",
-        "Не працювало спочатку, але техпідтримка допомогла вирішити проблему.",
-        "Повністю задоволений, буду звертатися ще.",
-        "",  # Порожній коментар (тільки оцінка)
-    ]
-    comment = random.choice(comments)
-    
-    # Випадкова дата (за останні 90 днів)
-    days_ago = random.randint(0, 90)
-    review_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Додавання відгуку
-    try:
-        cursor.execute(
+    return [(product[0], product[3]) for product in products]
+
+
+# Статус замовлення залежно від його давності в днях
+def order_status(rnd, age_days):
+    if age_days < 2:
+        statuses, weights = RECENT_STATUSES
+    elif age_days < 7:
+        statuses, weights = SHIPPING_STATUSES
+    else:
+        statuses, weights = FINAL_STATUSES
+    return rnd.choices(statuses, weights)[0]
+
+
+# Замовлення з 1-5 різними товарами (1-3 одиниці кожного); фіксація після кожної пачки
+def insert_orders(conn, rnd, client_ids, client_weights, products, product_weights, orders_count, start, end):
+    cursor = conn.cursor()
+    span_seconds = (end - start).total_seconds()
+    items_count = 0
+
+    for batch_start in range(0, orders_count, BATCH_SIZE):
+        batch_size = min(BATCH_SIZE, orders_count - batch_start)
+        buyers = rnd.choices(client_ids, cum_weights=client_weights, k=batch_size)
+        orders = []
+        items = []
+        for offset, user_id in enumerate(buyers):
+            order_id = batch_start + offset + 1
+            order_date = spread_date(rnd, start, span_seconds, order_id - 1, orders_count)
+
+            # Повтори відкидаються, порядок товарів зберігається
+            picked = dict.fromkeys(rnd.choices(products, cum_weights=product_weights, k=rnd.randint(1, 5)))
+            total_price = 0
+            for product_id, price in picked:
+                quantity = rnd.randint(1, 3)
+                items.append((order_id, product_id, quantity, price))
+                total_price += price * quantity
+
+            status = order_status(rnd, (end - order_date).days)
+            orders.append((order_id, user_id, order_date.strftime(DATE_FORMAT), status, round(total_price, 2)))
+
+        cursor.executemany(
+            "INSERT INTO orders (id, user_id, order_date, status, total_price) VALUES (?, ?, ?, ?, ?)", orders
+        )
+        cursor.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)", items
+        )
+        conn.commit()
+        items_count += len(items)
+
+    return items_count
+
+
+# Відгуки: не більше одного від клієнта на товар, середня оцінка своя для кожного товару
+def insert_reviews(conn, rnd, client_ids, client_weights, products, product_weights, reviews_count, start, end):
+    product_quality = {product_id: rnd.uniform(2.5, 4.8) for product_id, _ in products}
+    seen = set()
+    reviews = []
+    attempts = 0
+
+    # Популярні товари швидко вичерпують клієнтів, тому кількість спроб обмежена
+    while len(reviews) < reviews_count and attempts < reviews_count * 3:
+        batch_size = min(BATCH_SIZE, reviews_count - len(reviews))
+        attempts += batch_size
+        pairs = zip(rnd.choices(client_ids, cum_weights=client_weights, k=batch_size),
+                    rnd.choices(products, cum_weights=product_weights, k=batch_size))
+        for user_id, (product_id, _) in pairs:
+            if (user_id, product_id) in seen:
+                continue
+            seen.add((user_id, product_id))
+            rating = min(5, max(1, round(rnd.gauss(product_quality[product_id], 1.0))))
+            reviews.append((user_id, product_id, rating, rnd.choice(REVIEW_COMMENTS)))
+
+    span_seconds = (end - start).total_seconds()
+    rows = [(*review, spread_date(rnd, start, span_seconds, index, len(reviews)).strftime(DATE_FORMAT))
+            for index, review in enumerate(reviews)]
+    for batch_start in range(0, len(rows), BATCH_SIZE):
+        conn.executemany(
             "INSERT INTO reviews (user_id, product_id, rating, comment, review_date) VALUES (?, ?, ?, ?, ?)",
-            (client_id, product_id, rating, comment, review_date)
+            rows[batch_start:batch_start + BATCH_SIZE]
         )
-        print(f"Доданий відгук для товару #{product_id}")
-    except sqlite3.IntegrityError:
-        # Пропускаємо, якщо користувач вже залишив відгук для цього товару
-        pass
-
-# Додавання чат-повідомлень
-# Отримання ID менеджерів
-cursor.execute("SELECT id FROM users WHERE role = 'manager'")
-manager_ids = [row[0] for row in cursor.fetchall()]
-
-chat_messages_count = 100  # Створимо 100 повідомлень у чаті
-for _ in range(chat_messages_count):
-    # Випадковий клієнт
-    client_id = random.choice(client_ids)
-    
-    # Випадковий менеджер (або None для повідомлень від клієнта)
-    manager_id = random.choice(manager_ids) if random.random() > 0.5 else None
-    
-    # Визначення відправника
-    sender_role = "manager" if manager_id else "client"
-    
-    # Випадкові повідомлення
-    client_messages = [
-        "Добрий день, коли очікувати поставку мого замовлення?",
-        "Підкажіть, будь ласка, чи є у вас в наявності Arduino Mega?",
-        "Дякую за відповідь!",
-        "Я хотів би дізнатись більше про ваші сервоприводи.",
-        "Чи можна повернути товар, якщо він мені не підійде?",
-        "Коли буде знижка на мікроконтролери?",
-        "У мене виникла проблема з модулем WiFi, що мені робити?",
-        "Скільки часу триватиме доставка до Львова?",
-        "Чи є у вас запчастини для 3D-принтерів?",
-        "Мені потрібна консультація щодо вибору датчиків для мого проекту."
-    ]
-    
-    manager_messages = [
-        "Доброго дня! Чим можу допомогти?",
-        "Так, звичайно. Ваше замовлення буде доставлено протягом 2-3 днів.",
-        "Так, Arduino Mega є в наявності, можете оформити замовлення на сайті.",
-        "Будь ласка! Якщо виникнуть ще питання, звертайтеся.",
-        "У нас є широкий вибір сервоприводів. Що саме вас цікавить?",
-        "Так, повернення можливе протягом 14 днів з моменту отримання товару.",
-        "Знижки на мікроконтролери плануються наступного місяця, слідкуйте за оновленнями.",
-        "Будь ласка, опишіть проблему детальніше, і ми спробуємо допомогти.",
-        "Доставка до Львова зазвичай займає 1-2 дні при наявності товару на складі.",
-        "Так, у нас є різні запчастини для 3D-принтерів. Які саме вас цікавлять?"
-    ]
-    
-    message = random.choice(manager_messages) if sender_role == "manager" else random.choice(client_messages)
-    
-    # Випадкова дата (за останні 30 днів)
-    days_ago = random.randint(0, 30)
-    message_date = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Випадковий статус прочитання
-    is_read = random.choice([0, 1])
-    
-    # Додавання повідомлення
-    cursor.execute(
-        "INSERT INTO chat_messages (user_id, manager_id, sender_role, message, timestamp, is_read) VALUES (?, ?, ?, ?, ?, ?)",
-        (client_id, manager_id, sender_role, message, message_date, is_read)
-    )
-    print(f"Додане повідомлення в чаті")
+        conn.commit()
+    return len(rows)
+
+
+# Повідомлення чату: активні клієнти пишуть частіше, останню добу повідомлення ще не прочитані
+def insert_messages(conn, rnd, client_ids, client_weights, manager_ids, messages_count, start, end):
+    span_seconds = (end - start).total_seconds()
+    unread_after = end - timedelta(days=1)
+
+    for batch_start in range(0, messages_count, BATCH_SIZE):
+        batch_size = min(BATCH_SIZE, messages_count - batch_start)
+        senders = rnd.choices(client_ids, cum_weights=client_weights, k=batch_size)
+        messages = []
+        for offset, client_id in enumerate(senders):
+            timestamp = spread_date(rnd, start, span_seconds, batch_start + offset, messages_count)
+            if rnd.random() < 0.5:
+                manager_id, sender_role, message = rnd.choice(manager_ids), "manager", rnd.choice(MANAGER_MESSAGES)
+            else:
+                manager_id, sender_role, message = None, "client", rnd.choice(CLIENT_MESSAGES)
+            is_read = 1 if timestamp < unread_after else rnd.choice([0, 1])
+            messages.append((client_id, manager_id, sender_role, message, timestamp.strftime(DATE_FORMAT), is_read))
+
+        conn.executemany(
+            "INSERT INTO chat_messages (user_id, manager_id, sender_role, message, timestamp, is_read) VALUES (?, ?, ?, ?, ?, ?)",
+            messages
+        )
+        conn.commit()
+
+
+# Заповнення бази даних; end_date - день, яким закінчується період даних
+def generate(conn, users=len(CLIENTS), products=len(PRODUCTS), orders=25, reviews=80, messages=100,
+             seed=42, days=90, end_date=DEFAULT_END_DATE, skew=DEFAULT_SKEW):
+    rnd = random.Random(seed)
+    end = datetime.combine(end_date, datetime.min.time())
+    start = end - timedelta(days=days)
+    cursor = conn.cursor()
+
+    # Дані генеруються заново, тому втрата при збої не критична: запис без fsync
+    conn.execute("PRAGMA synchronous = OFF")
+
+    started = time.perf_counter()
+    def report(message):
+        print(f"{message} ({time.perf_counter() - started:.1f} с)")
+
+    clear_database(cursor)
+    conn.commit()
+    report("База даних очищена. Починаємо заповнення...")
+
+    manager_ids, client_ids = insert_users(cursor, users)
+    product_rows = insert_products(cursor, rnd, products)
+    conn.commit()
+    report(f"Додано менеджерів: {len(manager_ids)}, клієнтів: {len(client_ids)}, "
+           f"категорій: {len(CATEGORIES)}, товарів: {len(product_rows)}")
+
+    client_weights = zipf_cum_weights(rnd, len(client_ids), skew)
+    product_weights = product_popularity(seed, len(product_rows), skew)
+
+    items_count = insert_orders(conn, rnd, client_ids, client_weights, product_rows, product_weights, orders, start, end)
+    report(f"Додано замовлень: {orders}, позицій: {items_count}")
+
+    reviews_count = insert_reviews(conn, rnd, client_ids, client_weights, product_rows, product_weights, reviews, start, end)
+    report(f"Додано відгуків: {reviews_count}")
+
+    insert_messages(conn, rnd, client_ids, client_weights, manager_ids, messages, start, end)
+    report(f"Додано повідомлень у чаті: {messages}")
+
+    # Перерахунок зведених рейтингів товарів та денних підсумків продажів
+    rebuild_product_ratings(conn)
+    rebuild_sales_rollup(conn)
+    conn.commit()
+    conn.execute("PRAGMA optimize")
+    report("Перераховано рейтинги та підсумки продажів")
+
+
+def parse_end_date(value):
+    return date.today() if value == "today" else date.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заповнення бази даних тестовими даними")
+    parser.add_argument("--users", type=int, default=len(CLIENTS), help="кількість клієнтів")
+    parser.add_argument("--products", type=int, default=len(PRODUCTS), help="кількість товарів")
+    parser.add_argument("--orders", type=int, default=25, help="кількість замовлень")
+    parser.add_argument("--reviews", type=int, default=80, help="кількість відгуків")
+    parser.add_argument("--messages", type=int, default=100, help="кількість повідомлень у чаті")
+    parser.add_argument("--seed", type=int, default=42, help="початкове значення генератора")
+    parser.add_argument("--days", type=int, default=90, help="тривалість періоду даних у днях")
+    parser.add_argument("--end-date", type=parse_end_date, default=DEFAULT_END_DATE,
+                        help=f"останній день періоду або today (за замовчуванням {DEFAULT_END_DATE.isoformat()})")
+    parser.add_argument("--skew", type=float, default=DEFAULT_SKEW,
+                        help="показник розподілу Зіпфа (0 - рівномірна популярність)")
+    parser.add_argument("--db", default=db.DB_PATH, help="шлях до бази даних")
+    args = parser.parse_args()
+
+    # Міграції сервера створюють схему, якщо бази даних ще немає
+    db.pool = db.ConnectionPool(args.db)
+    import server
+    db.pool.close_all()
+
+    conn = connect(args.db)
+    try:
+        generate(conn, users=args.users, products=args.products, orders=args.orders, reviews=args.reviews,
+                 messages=args.messages, seed=args.seed, days=args.days, end_date=args.end_date, skew=args.skew)
+    finally:
+        conn.close()
 
-# Збереження змін
-conn.commit()
-conn.close()
 
-print("База даних успішно заповнена тестовими даними!")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 ﻿# server.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import sqlite3
 import hashlib
@@ -7,16 +7,32 @@ import datetime
 import secrets
 import jwt
 import os
+import json
+import base64
+import re
+import time
+import csv
+import io
+from db import get_db, pool, apply_review_rating, rebuild_product_ratings, apply_order_sales, rebuild_sales_rollup, CANCELLED_STATUS
+from cache import response_cache, principal_cache
+from events import chat_notifier
+from compression import choose_encoding, compress, encoded_etag, etag_variants, COMPRESSION_MIN_SIZE
 
 app = Flask(__name__)
 CORS(app)
-app.config['SECRET_KEY'] = secrets.token_hex(16)
+# Ключ підпису токенів; для кількох процесів сервера або збереження входу між перезапусками
+# задається змінною оточення ROBOTICS_SHOP_SECRET_KEY
+app.config['SECRET_KEY'] = os.environ.get('ROBOTICS_SHOP_SECRET_KEY') or secrets.token_hex(16)
+# Компактний JSON: без відступів і в режимі налагодження, кирилиця в UTF-8 замість \uXXXX
+app.json.compact = True
+app.json.ensure_ascii = False
 
-# Ініціалізація бази даних
-def init_db():
-    conn = sqlite3.connect('robotics_shop.db')
-    cursor = conn.cursor()
-    
+# Міграції схеми бази даних. Кожен крок виконується один раз в окремій транзакції,
+# застосовані версії записуються в таблицю schema_version. Нові кроки додаються
+# в кінець списку MIGRATIONS з наступним номером версії.
+
+# 1: початкові таблиці магазину
+def migrate_initial_tables(cursor):
     # Таблиця користувачів
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
@@ -105,9 +121,197 @@ def init_db():
         FOREIGN KEY (manager_id) REFERENCES users (id)
     )
     ''')
+
+# 2: зведені рейтинги товарів із заповненням для існуючих відгуків
+def migrate_product_ratings(cursor):
+    # Таблиця зведених рейтингів товарів
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS product_ratings (
+        product_id INTEGER PRIMARY KEY,
+        rating_sum INTEGER NOT NULL DEFAULT 0,
+        rating_count INTEGER NOT NULL DEFAULT 0,
+        rating_1 INTEGER NOT NULL DEFAULT 0,
+        rating_2 INTEGER NOT NULL DEFAULT 0,
+        rating_3 INTEGER NOT NULL DEFAULT 0,
+        rating_4 INTEGER NOT NULL DEFAULT 0,
+        rating_5 INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+    
+    rebuild_product_ratings(cursor.connection)
+
+# 3: повнотекстовий індекс товарів (FTS5). Апострофи всіх видів - роздільники,
+# тому "комп'ютер", "комп’ютер" і "компʼютер" індексуються однаково;
+# діакритику не прибираємо, щоб й/ї/є не зливалися з и/і/е.
+def migrate_search_index(cursor):
+    try:
+        cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, description,
+            content='products', content_rowid='id',
+            tokenize="unicode61 remove_diacritics 0 separators 'ʼ'"
+        )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite зібраний без FTS5 - залишається пошук через LIKE, крок повториться
+        # при наступному запуску (наприклад, після оновлення SQLite)
+        return False
+    
+    # Тригери синхронізують індекс з таблицею товарів (зміна кількості індекс не зачіпає)
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    ''')
+    cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+# 4: індекси для частих запитів
+def migrate_indexes(cursor):
+    # Відгуки товару (сторінка товару) та пошук відгуку користувача (add_review)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_product_date ON reviews (product_id, review_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_user_product ON reviews (user_id, product_id)")
+    
+    # Товари замовлення та історія замовлень
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_date ON orders (user_id, order_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_date ON orders (status, order_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (order_date)")
+    
+    # Повідомлення чату клієнта
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_user ON chat_messages (user_id, timestamp)")
+    
+    # Фільтр за категорією та сортування каталогу (разом з id для keyset-пагінації)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products (category_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products (name, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_price ON products (price, id)")
+
+# 5: лічильник версії каталогу. Тригери збільшують його в тій самій транзакції,
+# що змінює товари, категорії, відгуки або імена користувачів (вони показуються у відгуках),
+# тому версія однакова для всіх процесів сервера і для змін, зроблених seed.py
+def migrate_catalog_version(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    
+    watched = [("products", ""), ("categories", ""), ("reviews", ""), ("users", " OF username")]
+    for table, columns in watched:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            if columns and event != "UPDATE":
+                continue
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS catalog_version_{table}_{event.lower()} AFTER {event}{columns} ON {table} BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+            ''')
+
+# 6: непрочитані повідомлення розмови (скринька менеджера та позначення прочитаними)
+def migrate_chat_unread_index(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_unread ON chat_messages (user_id, is_read, sender_role)")
+
+# 7: денні підсумки продажів для аналітики, заповнюються з наявних замовлень
+def migrate_sales_rollup(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT PRIMARY KEY,
+        orders_count INTEGER NOT NULL DEFAULT 0,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales_daily_products (
+        day TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        category_id INTEGER,
+        orders_count INTEGER NOT NULL DEFAULT 0,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    )
+    ''')
+    
+    rebuild_sales_rollup(cursor.connection)
+
+# Міграція, що повернула False, не записується до schema_version і повторюється при наступному запуску
+MIGRATIONS = [
+    (1, "Початкові таблиці", migrate_initial_tables),
+    (2, "Зведені рейтинги товарів", migrate_product_ratings),
+    (3, "Повнотекстовий індекс товарів", migrate_search_index),
+    (4, "Індекси для частих запитів", migrate_indexes),
+    (5, "Лічильник версії каталогу", migrate_catalog_version),
+    (6, "Індекс непрочитаних повідомлень чату", migrate_chat_unread_index),
+    (7, "Денні підсумки продажів", migrate_sales_rollup),
+]
+
+# Ініціалізація бази даних: застосування нових міграцій
+def init_db():
+    global FTS_ENABLED
     
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
+        # Раніше крок 3 записувався і без FTS5 - такий запис знімається, щоб крок повторився
+        cursor.execute('''
+        DELETE FROM schema_version WHERE version = 3
+            AND NOT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts')
+        ''')
+        conn.commit()
+        
+        for version, description, migrate in MIGRATIONS:
+            # Блокування на запис, щоб кілька процесів не застосували крок двічі
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+                if cursor.fetchone() is not None:
+                    conn.commit()
+                    continue
+                
+                if migrate(cursor) is False:
+                    conn.commit()
+                    continue
+                
+                cursor.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                               (version, description))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+        FTS_ENABLED = cursor.fetchone() is not None
+
+# Повнотекстовий пошук доступний, якщо міграція 3 створила індекс
+FTS_ENABLED = False
+SEARCH_TOKEN_PATTERN = re.compile(r"[\w'’ʼ]+")
+
+# Запит FTS5: кожне слово пошуку шукається за префіксом, всі слова обов'язкові
+def build_fts_query(search_query):
+    tokens = SEARCH_TOKEN_PATTERN.findall(search_query)
+    return " ".join(f'"{token}"*' for token in tokens)
 
 # Виклик ініціалізації при запуску сервера
 init_db()
@@ -135,16 +339,15 @@ def register():
     hashed_password = hash_password(password)
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)",
-                      (username, hashed_password, email, role))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Користувач успішно зареєстрований"}), 201
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)",
+                          (username, hashed_password, email, role))
+            
+            conn.commit()
+            
+            return jsonify({"success": True, "message": "Користувач успішно зареєстрований"}), 201
     except sqlite3.IntegrityError:
         return jsonify({"success": False, "message": "Ім'я користувача або email вже використовуються"}), 409
     except Exception as e:
@@ -163,26 +366,25 @@ def login():
     hashed_password = hash_password(password)
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, username, email, role FROM users WHERE username = ? AND password = ?",
-                      (username, hashed_password))
-        
-        user = cursor.fetchone()
-        conn.close()
-        
-        if user:
-            user_data = {"id": user[0], "username": user[1], "email": user[2], "role": user[3]}
-            token = jwt.encode(
-                {"user_id": user[0], "username": user[1], "role": user[3], "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=24)},
-                app.config['SECRET_KEY'],
-                algorithm="HS256"
-            )
-            
-            return jsonify({"success": True, "token": token, "user": user_data}), 200
-        else:
-            return jsonify({"success": False, "message": "Неправильне ім'я користувача або пароль"}), 401
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT id, username, email, role FROM users WHERE username = ? AND password = ?",
+                          (username, hashed_password))
+            
+            user = cursor.fetchone()
+            
+            if user:
+                user_data = {"id": user[0], "username": user[1], "email": user[2], "role": user[3]}
+                token = jwt.encode(
+                    {"user_id": user[0], "username": user[1], "role": user[3], "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=24)},
+                    app.config['SECRET_KEY'],
+                    algorithm="HS256"
+                )
+                
+                return jsonify({"success": True, "token": token, "user": user_data}), 200
+            else:
+                return jsonify({"success": False, "message": "Неправильне ім'я користувача або пароль"}), 401
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -201,12 +403,19 @@ def token_required(f):
         try:
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
             
-            conn = sqlite3.connect('robotics_shop.db')
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT id, username, role FROM users WHERE id = ?", (data['user_id'],))
-            current_user = cursor.fetchone()
-            conn.close()
+            # Користувач, перевірений нещодавно, береться з кешу без запиту до бази даних
+            key = ('user', data['user_id'], token)
+            current_user = principal_cache.get(key)
+            if current_user is None:
+                generation = principal_cache.generation
+                with get_db() as conn:
+                    cursor = conn.cursor()
+                    
+                    cursor.execute("SELECT id, username, role FROM users WHERE id = ?", (data['user_id'],))
+                    current_user = cursor.fetchone()
+                
+                if current_user:
+                    principal_cache.put(key, current_user, generation)
             
             if not current_user:
                 return jsonify({"success": False, "message": "Недійсний токен"}), 401
@@ -218,138 +427,409 @@ def token_required(f):
     decorated.__name__ = f.__name__
     return decorated
 
+# Поточна версія каталогу (збільшується тригерами з міграції 5)
+def get_catalog_version():
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM catalog_version WHERE id = 1")
+        return cursor.fetchone()[0]
+
+# Стиснення JSON-відповідей за Accept-Encoding (brotli, якщо встановлено, або gzip).
+# Малі відповіді та потокові відповіді (експорт) не стискаються
+def response_encoding(body):
+    encoding = choose_encoding(request.accept_encodings)
+    return encoding if encoding and len(body) >= COMPRESSION_MIN_SIZE else None
+
+def set_compressed_body(response, body, encoding):
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(encoded_etag(etag, encoding), weak)
+
+@app.after_request
+def compress_response(response):
+    if response.status_code != 200 or response.mimetype != 'application/json' or response.is_streamed:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    
+    # Відповіді каталогу вже стиснені в cached_response
+    if 'Content-Encoding' in response.headers:
+        return response
+    
+    body = response.get_data()
+    encoding = response_encoding(body)
+    if encoding:
+        set_compressed_body(response, compress(body, encoding), encoding)
+    
+    return response
+
+# Умовні запити та кешування успішних відповідей каталогу.
+# Ключ кешу - простір імен, id товару, нормалізовані параметри запиту (відсортовані,
+# без порожніх значень) та версія каталогу, тому зміни, зроблені іншим процесом,
+# теж не повертаються з кешу. ETag - версія та хеш ключа: він свій для кожного
+# ресурсу, і 304 віддається лише тоді, коли для цього ключа відома відповідь 200
+# (з кешу або щойно отримана від обробника), а не на помилку чи інший ресурс.
+# Стиснені варіанти кешуються поруч з ключем, доповненим кодуванням.
+# Записи видаляються ендпоінтами, що змінюють відповідні дані.
+def cached_response(namespace):
+    def decorator(f):
+        def decorated(*args, **kwargs):
+            version = get_catalog_version()
+            params = tuple(sorted((name, value) for name, value in request.args.items(multi=True) if value != ''))
+            key = (namespace, kwargs.get('product_id'), params, version)
+            etag = f"catalog-{version}-{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}"
+            generation = response_cache.generation
+            
+            cached = response_cache.get(key)
+            if cached is not None:
+                response = app.response_class(cached, status=200, mimetype='application/json')
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response_cache.put(key, response.get_data(), generation)
+            
+            # Клієнт міг отримати стиснений варіант з власним ETag. Заголовки 304 ті самі,
+            # що й у відповіді 200, щоб спільний кеш не сплутав представлення
+            for candidate in etag_variants(etag):
+                if request.if_none_match.contains(candidate):
+                    response = app.response_class(status=304)
+                    response.set_etag(candidate)
+                    response.headers['Cache-Control'] = 'no-cache'
+                    response.vary.add('Accept-Encoding')
+                    return response
+            
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            
+            body = response.get_data()
+            encoding = response_encoding(body)
+            if encoding:
+                compressed = response_cache.get(key + (encoding,))
+                if compressed is None:
+                    compressed = compress(body, encoding)
+                    response_cache.put(key + (encoding,), compressed, generation)
+                set_compressed_body(response, compressed, encoding)
+            return response
+        
+        decorated.__name__ = f.__name__
+        return decorated
+    return decorator
+
+# Проєкція полів: параметр fields=id,name,price залишає в записах лише перелічені поля.
+# Повертає список полів (None - усі поля) або ValueError для невідомих полів
+def requested_fields(allowed):
+    fields = list(dict.fromkeys(field.strip() for field in request.args.get('fields', '').split(',') if field.strip()))
+    if not fields:
+        return None
+    
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Невідомі поля: {', '.join(unknown)}. Допустимі значення: {', '.join(allowed)}")
+    return fields
+
+def project_fields(records, fields):
+    if fields is None:
+        return records
+    return [{field: record[field] for field in fields if field in record} for record in records]
+
 # Ендпоінт для отримання списку категорій
 @app.route('/categories', methods=['GET'])
+@cached_response('categories')
 def get_categories():
     try:
-        conn = sqlite3.connect('robotics_shop.db')
+        with get_db() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT * FROM categories")
+            categories = [dict(row) for row in cursor.fetchall()]
+            
+            
+            return jsonify({"success": True, "categories": categories}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
+
+# Середній рейтинг та кількість відгуків зі зведеної таблиці product_ratings (псевдонім pr)
+RATING_SELECT = """
+    CASE WHEN pr.rating_count > 0 THEN CAST(pr.rating_sum AS REAL) / pr.rating_count ELSE 0 END as avg_rating,
+    COALESCE(pr.rating_count, 0) as reviews_count"""
+
+# Розмір сторінки каталогу за замовчуванням та максимальний
+PRODUCTS_PAGE_SIZE = 50
+PRODUCTS_MAX_PAGE_SIZE = 200
+
+# Курсор сторінки: значення ключа сортування та id останнього запису
+def encode_cursor(sort_by, sort_order, row):
+    payload = json.dumps([sort_by, sort_order, row[sort_by], row['id']], ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor, sort_by, sort_order):
+    try:
+        cursor_sort_by, cursor_sort_order, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        return None
+    
+    # Курсор дійсний лише для того ж сортування, з яким він був виданий
+    if (cursor_sort_by, cursor_sort_order) != (sort_by, sort_order):
+        return None
+    
+    # Значення потрапляють у SQL-параметри: лише скаляри (None - для стовпців, що можуть бути NULL)
+    if type(last_id) is not int or not (value is None or type(value) in (str, int, float)):
+        return None
+    
+    return value, last_id
+
+# Максимальна кількість товарів в одному пакетному запиті GET /products?ids=...
+PRODUCTS_MAX_BATCH_SIZE = 200
+
+# Поля записів товарів, доступні для проєкції fields=
+PRODUCT_FIELDS = ['id', 'name', 'description', 'price', 'quantity', 'category_id', 'image_url',
+                  'category_name', 'avg_rating', 'reviews_count', 'relevance']
+PRODUCT_BATCH_FIELDS = ['id', 'name', 'price', 'quantity', 'category_id', 'image_url']
+
+# Полегшені записи товарів за списком id (для кошика та замовлень): один запит
+# без опису, рейтингу та відгуків; відсутні id повертаються окремим списком
+def get_products_batch(ids_param):
+    try:
+        product_ids = list(dict.fromkeys(int(value) for value in ids_param.split(',') if value.strip()))
+    except ValueError:
+        return jsonify({"success": False, "message": "Недійсний список ID товарів"}), 400
+    
+    if not product_ids:
+        return jsonify({"success": False, "message": "Недійсний список ID товарів"}), 400
+    
+    if len(product_ids) > PRODUCTS_MAX_BATCH_SIZE:
+        return jsonify({"success": False, "message": f"Можна запитати не більше {PRODUCTS_MAX_BATCH_SIZE} товарів"}), 400
+    
+    try:
+        fields = requested_fields(PRODUCT_BATCH_FIELDS)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    with get_db() as conn:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM categories")
-        categories = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        
-        return jsonify({"success": True, "categories": categories}), 200
-    except Exception as e:
-        return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
+        placeholders = ", ".join("?" * len(product_ids))
+        cursor.execute(f"""
+            SELECT id, name, price, quantity, category_id, image_url
+            FROM products
+            WHERE id IN ({placeholders})
+        """, product_ids)
+        found = {row['id']: dict(row) for row in cursor.fetchall()}
+    
+    # Порядок відповіді відповідає порядку id у запиті
+    products = [found[product_id] for product_id in product_ids if product_id in found]
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    
+    return jsonify({"success": True, "products": project_fields(products, fields), "missing": missing}), 200
 
 # Ендпоінт для отримання товарів
 @app.route('/products', methods=['GET'])
+@cached_response('products')
 def get_products():
     try:
+        ids_param = request.args.get('ids')
+        if ids_param is not None:
+            return get_products_batch(ids_param)
+        
         category_id = request.args.get('category_id')
         search_query = request.args.get('search', '')
         sort_by = request.args.get('sort_by', 'name')
-        sort_order = request.args.get('sort_order', 'asc')
+        sort_order = request.args.get('sort_order')
         min_price = request.args.get('min_price')
         max_price = request.args.get('max_price')
+        limit = request.args.get('limit', PRODUCTS_PAGE_SIZE, type=int)
+        page_cursor = request.args.get('cursor')
         
-        conn = sqlite3.connect('robotics_shop.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        query = "SELECT p.*, c.name as category_name FROM products p LEFT JOIN categories c ON p.category_id = c.id WHERE 1=1"
-        params = []
-        
-        if category_id:
-            query += " AND p.category_id = ?"
-            params.append(category_id)
-        
-        if search_query:
-            query += " AND (p.name LIKE ? OR p.description LIKE ?)"
-            params.extend([f'%{search_query}%', f'%{search_query}%'])
-        
-        if min_price:
-            query += " AND p.price >= ?"
-            params.append(min_price)
+        fts_query = build_fts_query(search_query) if search_query and FTS_ENABLED else ''
         
-        if max_price:
-            query += " AND p.price <= ?"
-            params.append(max_price)
-        
-        # Валідація сортування
-        valid_sort_fields = ['name', 'price']
+        # Валідація сортування (за релевантністю - лише для повнотекстового пошуку)
+        valid_sort_fields = ['name', 'price', 'id'] + (['relevance'] if fts_query else [])
         valid_sort_orders = ['asc', 'desc']
         
         if sort_by not in valid_sort_fields:
             sort_by = 'name'
         
+        # Релевантність - це -bm25, тому без явного порядку найрелевантніші йдуть першими
         if sort_order not in valid_sort_orders:
-            sort_order = 'asc'
-        
-        query += f" ORDER BY p.{sort_by} {sort_order}"
+            sort_order = 'desc' if sort_by == 'relevance' else 'asc'
         
-        cursor.execute(query, params)
-        products = [dict(row) for row in cursor.fetchall()]
+        sort_column = 's.relevance' if sort_by == 'relevance' else f'p.{sort_by}'
+        limit = max(1, min(limit, PRODUCTS_MAX_PAGE_SIZE))
         
-        # Додавання рейтингу для кожного товару
-        for product in products:
-            cursor.execute("""
-                SELECT AVG(rating) as avg_rating, COUNT(id) as reviews_count 
-                FROM reviews 
-                WHERE product_id = ?
-            """, (product['id'],))
-            
-            rating_data = cursor.fetchone()
-            product['avg_rating'] = rating_data['avg_rating'] if rating_data['avg_rating'] else 0
-            product['reviews_count'] = rating_data['reviews_count']
-        
-        conn.close()
+        try:
+            fields = requested_fields(PRODUCT_FIELDS)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
         
-        return jsonify({"success": True, "products": products}), 200
+        with get_db() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            # Рейтинг береться зі зведеної таблиці разом зі списком товарів
+            query = f"""
+                SELECT p.*, c.name as category_name, {RATING_SELECT}{", s.relevance" if fts_query else ""}
+                FROM products p
+                LEFT JOIN categories c ON p.category_id = c.id
+                LEFT JOIN product_ratings pr ON pr.product_id = p.id"""
+            params = []
+            
+            # Повнотекстовий пошук; релевантність - bm25 з більшою вагою назви
+            if fts_query:
+                query += """
+                JOIN (
+                    SELECT rowid, -bm25(products_fts, 10.0, 1.0) as relevance
+                    FROM products_fts
+                    WHERE products_fts MATCH ?
+                ) s ON s.rowid = p.id"""
+                params.append(fts_query)
+            
+            query += " WHERE 1=1"
+            
+            if category_id:
+                query += " AND p.category_id = ?"
+                params.append(category_id)
+            
+            if search_query and not fts_query:
+                query += " AND (p.name LIKE ? OR p.description LIKE ?)"
+                params.extend([f'%{search_query}%', f'%{search_query}%'])
+            
+            if min_price:
+                query += " AND p.price >= ?"
+                params.append(min_price)
+            
+            if max_price:
+                query += " AND p.price <= ?"
+                params.append(max_price)
+            
+            # Keyset-пагінація: продовжуємо після останнього товару попередньої сторінки
+            if page_cursor:
+                position = decode_cursor(page_cursor, sort_by, sort_order)
+                if position is None:
+                    return jsonify({"success": False, "message": "Недійсний курсор"}), 400
+                
+                comparison = '>' if sort_order == 'asc' else '<'
+                if sort_by == 'id':
+                    query += f" AND p.id {comparison} ?"
+                    params.append(position[1])
+                else:
+                    query += f" AND ({sort_column}, p.id) {comparison} (?, ?)"
+                    params.extend(position)
+            
+            query += f" ORDER BY {sort_column} {sort_order}, p.id {sort_order} LIMIT ?"
+            params.append(limit + 1)
+            
+            cursor.execute(query, params)
+            products = [dict(row) for row in cursor.fetchall()]
+            
+            next_cursor = None
+            if len(products) > limit:
+                products = products[:limit]
+                next_cursor = encode_cursor(sort_by, sort_order, products[-1])
+
+            return jsonify({"success": True, "products": project_fields(products, fields), "next_cursor": next_cursor}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
+# Кількість відгуків у відповіді GET /products/<id>; решта завантажується
+# посторінково через GET /products/<id>/reviews
+PRODUCT_REVIEWS_PREVIEW = 5
+REVIEWS_PAGE_SIZE = 20
+REVIEWS_MAX_PAGE_SIZE = 100
+
+# Сторінка відгуків товару від новіших до старіших (індекс idx_reviews_product_date)
+def load_reviews_page(cursor, product_id, limit, position=None):
+    query = """
+        SELECT r.*, u.username 
+        FROM reviews r 
+        JOIN users u ON r.user_id = u.id 
+        WHERE r.product_id = ?"""
+    params = [product_id]
+    
+    if position:
+        query += " AND (r.review_date, r.id) < (?, ?)"
+        params.extend(position)
+    
+    query += " ORDER BY r.review_date DESC, r.id DESC LIMIT ?"
+    params.append(limit + 1)
+    
+    cursor.execute(query, params)
+    reviews = [dict(row) for row in cursor.fetchall()]
+    
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        next_cursor = encode_cursor('review_date', 'desc', reviews[-1])
+    
+    return reviews, next_cursor
+
 # Ендпоінт для отримання деталей товару
 @app.route('/products/<int:product_id>', methods=['GET'])
+@cached_response('product')
 def get_product(product_id):
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT p.*, c.name as category_name 
-            FROM products p 
-            LEFT JOIN categories c ON p.category_id = c.id 
-            WHERE p.id = ?
-        """, (product_id,))
-        
-        product = cursor.fetchone()
-        
-        if not product:
-            return jsonify({"success": False, "message": "Товар не знайдено"}), 404
-        
-        product_dict = dict(product)
-        
-        # Отримання відгуків
-        cursor.execute("""
-            SELECT r.*, u.username 
-            FROM reviews r 
-            JOIN users u ON r.user_id = u.id 
-            WHERE r.product_id = ? 
-            ORDER BY r.review_date DESC
-        """, (product_id,))
-        
-        reviews = [dict(row) for row in cursor.fetchall()]
-        
-        # Отримання середнього рейтингу
-        cursor.execute("""
-            SELECT AVG(rating) as avg_rating, COUNT(id) as reviews_count 
-            FROM reviews 
-            WHERE product_id = ?
-        """, (product_id,))
-        
-        rating_data = cursor.fetchone()
-        product_dict['avg_rating'] = rating_data['avg_rating'] if rating_data['avg_rating'] else 0
-        product_dict['reviews_count'] = rating_data['reviews_count']
-        product_dict['reviews'] = reviews
-        
-        conn.close()
-        
-        return jsonify({"success": True, "product": product_dict}), 200
+        with get_db() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute(f"""
+                SELECT p.*, c.name as category_name, {RATING_SELECT},
+                       {", ".join(f"COALESCE(pr.rating_{value}, 0) as rating_{value}" for value in range(1, 6))}
+                FROM products p 
+                LEFT JOIN categories c ON p.category_id = c.id 
+                LEFT JOIN product_ratings pr ON pr.product_id = p.id
+                WHERE p.id = ?
+            """, (product_id,))
+            
+            product = cursor.fetchone()
+            
+            if not product:
+                return jsonify({"success": False, "message": "Товар не знайдено"}), 404
+            
+            product_dict = dict(product)
+            product_dict['rating_histogram'] = {value: product_dict.pop(f'rating_{value}') for value in range(1, 6)}
+            
+            # Перші відгуки та курсор для завантаження наступних
+            reviews, next_cursor = load_reviews_page(cursor, product_id, PRODUCT_REVIEWS_PREVIEW)
+            
+            product_dict['reviews'] = reviews
+            product_dict['reviews_next_cursor'] = next_cursor
+            
+            return jsonify({"success": True, "product": product_dict}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
+
+# Ендпоінт для посторінкового отримання відгуків товару
+@app.route('/products/<int:product_id>/reviews', methods=['GET'])
+@cached_response('reviews')
+def get_product_reviews(product_id):
+    try:
+        limit = request.args.get('limit', REVIEWS_PAGE_SIZE, type=int)
+        page_cursor = request.args.get('cursor')
+        limit = max(1, min(limit, REVIEWS_MAX_PAGE_SIZE))
+        
+        position = None
+        if page_cursor:
+            position = decode_cursor(page_cursor, 'review_date', 'desc')
+            if position is None:
+                return jsonify({"success": False, "message": "Недійсний курсор"}), 400
+        
+        with get_db() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT 1 FROM products WHERE id = ?", (product_id,))
+            if not cursor.fetchone():
+                return jsonify({"success": False, "message": "Товар не знайдено"}), 404
+            
+            reviews, next_cursor = load_reviews_page(cursor, product_id, limit, position)
+            
+            return jsonify({"success": True, "reviews": reviews, "next_cursor": next_cursor}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -368,70 +848,102 @@ def create_order(current_user):
     if not items:
         return jsonify({"success": False, "message": "Замовлення не може бути порожнім"}), 400
     
+    # Об'єднання повторів одного товару в одну позицію
+    quantities = {}
+    for item in items:
+        product_id = item.get('product_id')
+        quantity = item.get('quantity', 1)
+        if not isinstance(product_id, int) or not isinstance(quantity, int) or quantity < 1:
+            return jsonify({"success": False, "message": "Недійсна позиція замовлення"}), 400
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка наявності товарів та розрахунок загальної суми
-        total_price = 0
-        for item in items:
-            product_id = item.get('product_id')
-            quantity = item.get('quantity', 1)
-            
-            cursor.execute("SELECT price, quantity FROM products WHERE id = ?", (product_id,))
-            product = cursor.fetchone()
+        with get_db() as conn:
+            cursor = conn.cursor()
             
-            if not product:
-                conn.close()
-                return jsonify({"success": False, "message": f"Товар з ID {product_id} не знайдено"}), 404
+            # Блокування запису до кінця транзакції: перевірка і списання залишків атомарні
+            cursor.execute("BEGIN IMMEDIATE")
             
-            price, available_quantity = product
+            placeholders = ", ".join("?" * len(quantities))
+            cursor.execute(f"SELECT id, price, quantity FROM products WHERE id IN ({placeholders})",
+                           list(quantities))
+            products = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
             
-            if quantity > available_quantity:
-                conn.close()
-                return jsonify({"success": False, "message": f"Недостатня кількість товару (ID: {product_id})"}), 400
+            missing = [product_id for product_id in quantities if product_id not in products]
+            if missing:
+                conn.rollback()
+                return jsonify({
+                    "success": False,
+                    "message": f"Товар з ID {', '.join(map(str, missing))} не знайдено",
+                    "shortfalls": [{"product_id": product_id, "requested": quantities[product_id], "available": 0}
+                                   for product_id in missing]
+                }), 404
             
-            total_price += price * quantity
-        
-        # Створення замовлення
-        cursor.execute("""
-            INSERT INTO orders (user_id, total_price) 
-            VALUES (?, ?)
-        """, (user_id, total_price))
-        
-        order_id = cursor.lastrowid
-        
-        # Додавання товарів до замовлення та оновлення кількості товарів
-        for item in items:
-            product_id = item.get('product_id')
-            quantity = item.get('quantity', 1)
+            shortfalls = [
+                {"product_id": product_id, "requested": quantity, "available": products[product_id][1]}
+                for product_id, quantity in quantities.items()
+                if quantity > products[product_id][1]
+            ]
+            if shortfalls:
+                conn.rollback()
+                return jsonify({
+                    "success": False,
+                    "message": f"Недостатня кількість товару (ID: {', '.join(str(s['product_id']) for s in shortfalls)})",
+                    "shortfalls": shortfalls
+                }), 400
             
-            cursor.execute("SELECT price FROM products WHERE id = ?", (product_id,))
-            price = cursor.fetchone()[0]
+            total_price = sum(products[product_id][0] * quantity for product_id, quantity in quantities.items())
             
+            # Створення замовлення
             cursor.execute("""
+                INSERT INTO orders (user_id, total_price) 
+                VALUES (?, ?)
+            """, (user_id, total_price))
+            
+            order_id = cursor.lastrowid
+            
+            cursor.executemany("""
                 INSERT INTO order_items (order_id, product_id, quantity, price_per_item) 
                 VALUES (?, ?, ?, ?)
-            """, (order_id, product_id, quantity, price))
+            """, [(order_id, product_id, quantity, products[product_id][0])
+                  for product_id, quantity in quantities.items()])
             
-            cursor.execute("""
+            # Умовне списання: залишок ніколи не стає від'ємним
+            cursor.executemany("""
                 UPDATE products 
                 SET quantity = quantity - ? 
-                WHERE id = ?
-            """, (quantity, product_id))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            "success": True, 
-            "message": "Замовлення успішно створено", 
-            "order_id": order_id,
-            "total_price": total_price
-        }), 201
+                WHERE id = ? AND quantity >= ?
+            """, [(quantity, product_id, quantity) for product_id, quantity in quantities.items()])
+            
+            if cursor.rowcount != len(quantities):
+                conn.rollback()
+                return jsonify({"success": False, "message": "Залишки товарів змінилися, спробуйте ще раз"}), 409
+            
+            # Денні підсумки продажів оновлюються в тій самій транзакції
+            apply_order_sales(cursor, order_id, 1)
+            
+            conn.commit()
+            
+            # Змінилися залишки замовлених товарів
+            response_cache.invalidate('products')
+            response_cache.invalidate('product', *quantities)
+            
+            return jsonify({
+                "success": True, 
+                "message": "Замовлення успішно створено", 
+                "order_id": order_id,
+                "total_price": total_price
+            }), 201
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
+# Розмір сторінки історії замовлень за замовчуванням та максимальний
+ORDERS_PAGE_SIZE = 50
+ORDERS_MAX_PAGE_SIZE = 200
+
+# Поля записів замовлень, доступні для проєкції fields= (username - лише для менеджерів)
+ORDER_FIELDS = ['id', 'user_id', 'username', 'order_date', 'status', 'total_price', 'items']
+
 # Ендпоінт для отримання історії замовлень користувача
 @app.route('/orders/history', methods=['GET'])
 @token_required
@@ -441,51 +953,98 @@ def get_order_history(current_user):
     if role not in ['client', 'manager']:
         return jsonify({"success": False, "message": "Доступ заборонено"}), 403
     
+    limit = request.args.get('limit', ORDERS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, ORDERS_MAX_PAGE_SIZE))
+    page_cursor = request.args.get('cursor')
+    
+    # Фільтр за періодом (дати у форматі РРРР-ММ-ДД, обидві межі включно)
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Якщо користувач - клієнт, показуємо тільки його замовлення
-        # Якщо менеджер - можемо показати всі замовлення або фільтрувати
-        if role == 'client':
-            cursor.execute("""
-                SELECT * FROM orders WHERE user_id = ? ORDER BY order_date DESC
-            """, (user_id,))
-        else:
-            user_filter = request.args.get('user_id')
-            status_filter = request.args.get('status')
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        if date_from:
+            date_from = datetime.date.fromisoformat(date_from).isoformat()
+        if date_to:
+            date_to = (datetime.date.fromisoformat(date_to) + datetime.timedelta(days=1)).isoformat()
+    except ValueError:
+        return jsonify({"success": False, "message": "Недійсна дата. Очікуваний формат: РРРР-ММ-ДД"}), 400
+    
+    try:
+        fields = requested_fields(ORDER_FIELDS)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    try:
+        with get_db() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
             
-            query = "SELECT o.*, u.username FROM orders o JOIN users u ON o.user_id = u.id WHERE 1=1"
-            params = []
+            # Якщо користувач - клієнт, показуємо тільки його замовлення
+            # Якщо менеджер - можемо показати всі замовлення або фільтрувати
+            if role == 'client':
+                query = "SELECT o.* FROM orders o WHERE o.user_id = ?"
+                params = [user_id]
+            else:
+                user_filter = request.args.get('user_id')
+                status_filter = request.args.get('status')
+                
+                query = "SELECT o.*, u.username FROM orders o JOIN users u ON o.user_id = u.id WHERE 1=1"
+                params = []
+                
+                if user_filter:
+                    query += " AND o.user_id = ?"
+                    params.append(user_filter)
+                
+                if status_filter:
+                    query += " AND o.status = ?"
+                    params.append(status_filter)
             
-            if user_filter:
-                query += " AND o.user_id = ?"
-                params.append(user_filter)
+            if date_from:
+                query += " AND o.order_date >= ?"
+                params.append(date_from)
             
-            if status_filter:
-                query += " AND o.status = ?"
-                params.append(status_filter)
+            if date_to:
+                query += " AND o.order_date < ?"
+                params.append(date_to)
+            
+            # Keyset-пагінація від найновіших замовлень
+            if page_cursor:
+                position = decode_cursor(page_cursor, 'order_date', 'desc')
+                if position is None:
+                    return jsonify({"success": False, "message": "Недійсний курсор"}), 400
+                
+                query += " AND (o.order_date, o.id) < (?, ?)"
+                params.extend(position)
             
-            query += " ORDER BY o.order_date DESC"
+            query += " ORDER BY o.order_date DESC, o.id DESC LIMIT ?"
+            params.append(limit + 1)
             cursor.execute(query, params)
-        
-        orders = [dict(row) for row in cursor.fetchall()]
-        
-        # Отримання товарів для кожного замовлення
-        for order in orders:
-            cursor.execute("""
-                SELECT oi.*, p.name as product_name 
-                FROM order_items oi 
-                JOIN products p ON oi.product_id = p.id 
-                WHERE oi.order_id = ?
-            """, (order['id'],))
             
-            order['items'] = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
-        
-        return jsonify({"success": True, "orders": orders}), 200
+            orders = [dict(row) for row in cursor.fetchall()]
+            
+            next_cursor = None
+            if len(orders) > limit:
+                orders = orders[:limit]
+                next_cursor = encode_cursor('order_date', 'desc', orders[-1])
+            
+            # Товари всіх замовлень сторінки одним запитом (не завантажуються,
+            # якщо проєкція fields= їх не містить)
+            items_by_order = {order['id']: [] for order in orders}
+            if orders and (fields is None or 'items' in fields):
+                cursor.execute(f"""
+                    SELECT oi.*, p.name as product_name 
+                    FROM order_items oi 
+                    JOIN products p ON oi.product_id = p.id 
+                    WHERE oi.order_id IN ({", ".join("?" * len(orders))})
+                    ORDER BY oi.id
+                """, list(items_by_order))
+                
+                for row in cursor.fetchall():
+                    items_by_order[row['order_id']].append(dict(row))
+            
+            for order in orders:
+                order['items'] = items_by_order[order['id']]
+            
+            return jsonify({"success": True, "orders": project_fields(orders, fields), "next_cursor": next_cursor}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -506,42 +1065,46 @@ def add_review(current_user, product_id):
         return jsonify({"success": False, "message": "Рейтинг повинен бути числом від 1 до 5"}), 400
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка, чи існує товар
-        cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"success": False, "message": "Товар не знайдено"}), 404
-        
-        # Перевірка, чи користувач вже додавав відгук для цього товару
-        cursor.execute("SELECT id FROM reviews WHERE user_id = ? AND product_id = ?", (user_id, product_id))
-        existing_review = cursor.fetchone()
-        
-        if existing_review:
-            # Оновлення існуючого відгуку
-            cursor.execute("""
-                UPDATE reviews 
-                SET rating = ?, comment = ?, review_date = CURRENT_TIMESTAMP 
-                WHERE id = ?
-            """, (rating, comment, existing_review[0]))
-            message = "Відгук успішно оновлено"
-        else:
-            # Додавання нового відгуку
-            cursor.execute("""
-                INSERT INTO reviews (user_id, product_id, rating, comment) 
-                VALUES (?, ?, ?, ?)
-            """, (user_id, product_id, rating, comment))
-            message = "Відгук успішно додано"
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": message}), 200
-    except Exception as e:
-        return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
-
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Перевірка, чи існує товар
+            cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
+            if not cursor.fetchone():
+                return jsonify({"success": False, "message": "Товар не знайдено"}), 404
+            
+            # Перевірка, чи користувач вже додавав відгук для цього товару
+            cursor.execute("SELECT id, rating FROM reviews WHERE user_id = ? AND product_id = ?", (user_id, product_id))
+            existing_review = cursor.fetchone()
+            
+            if existing_review:
+                # Оновлення існуючого відгуку
+                cursor.execute("""
+                    UPDATE reviews 
+                    SET rating = ?, comment = ?, review_date = CURRENT_TIMESTAMP 
+                    WHERE id = ?
+                """, (rating, comment, existing_review[0]))
+                apply_review_rating(cursor, product_id, old_rating=existing_review[1], new_rating=rating)
+                message = "Відгук успішно оновлено"
+            else:
+                # Додавання нового відгуку
+                cursor.execute("""
+                    INSERT INTO reviews (user_id, product_id, rating, comment) 
+                    VALUES (?, ?, ?, ?)
+                """, (user_id, product_id, rating, comment))
+                apply_review_rating(cursor, product_id, new_rating=rating)
+                message = "Відгук успішно додано"
+            
+            conn.commit()
+            
+            response_cache.invalidate('products')
+            response_cache.invalidate('product', product_id)
+            response_cache.invalidate('reviews', product_id)
+            
+            return jsonify({"success": True, "message": message}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
+
 # Ендпоінти для менеджерів (CRUD для товарів)
 @app.route('/products', methods=['POST'])
 @token_required
@@ -563,33 +1126,255 @@ def create_product(current_user):
         return jsonify({"success": False, "message": "Необхідні поля: name, price, quantity, category_id"}), 400
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка, чи існує категорія
-        cursor.execute("SELECT id FROM categories WHERE id = ?", (category_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"success": False, "message": "Категорія не знайдена"}), 404
-        
-        cursor.execute("""
-            INSERT INTO products (name, description, price, quantity, category_id, image_url) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (name, description, price, quantity, category_id, image_url))
-        
-        product_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Перевірка, чи існує категорія
+            cursor.execute("SELECT id FROM categories WHERE id = ?", (category_id,))
+            if not cursor.fetchone():
+                return jsonify({"success": False, "message": "Категорія не знайдена"}), 404
+            
+            cursor.execute("""
+                INSERT INTO products (name, description, price, quantity, category_id, image_url) 
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (name, description, price, quantity, category_id, image_url))
+            
+            product_id = cursor.lastrowid
+            
+            conn.commit()
+            
+            response_cache.invalidate('products')
+            
+            return jsonify({
+                "success": True, 
+                "message": "Товар успішно додано", 
+                "product_id": product_id
+            }), 201
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
+
+# Масовий імпорт та експорт товарів (CSV або JSON Lines - один JSON-об'єкт на рядок).
+# Стовпці: id, name, description, price, quantity, category_id або category (назва), image_url.
+# Рядок з id існуючого товару оновлює його (відсутні необов'язкові поля не змінюються),
+# решта рядків додаються як нові товари.
+IMPORT_FIELDS = ["id", "name", "description", "price", "quantity", "category_id", "category", "image_url"]
+EXPORT_FIELDS = ["id", "name", "description", "price", "quantity", "category_id", "category", "image_url"]
+IMPORT_MAX_ERRORS = 1000
+EXPORT_BATCH_SIZE = 1000
+
+# Формат файлу за заголовком Content-Type або параметром format
+def bulk_format(value):
+    value = (value or '').lower()
+    if 'csv' in value:
+        return 'csv'
+    if 'json' in value:
+        return 'jsonl'
+    return None
+
+# Рядки файлу імпорту по одному, без завантаження всього тіла запиту в пам'ять:
+# (номер рядка, словник полів або None, повідомлення про помилку)
+def read_import_rows(stream, file_format):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row_number, row in enumerate(reader, start=2):
+            yield row_number, {name: value for name, value in row.items() if name and value not in (None, '')}, None
+    else:
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield row_number, None, "Недійсний JSON"
+                continue
+            if not isinstance(row, dict):
+                yield row_number, None, "Рядок має бути JSON-об'єктом"
+                continue
+            yield row_number, {name: value for name, value in row.items() if value not in (None, '')}, None
+
+# Перевірка рядка імпорту; повертає (значення, помилка)
+def validate_import_row(row, category_ids, category_names):
+    unknown = set(row) - set(IMPORT_FIELDS)
+    if unknown:
+        return None, f"Невідомі поля: {', '.join(sorted(unknown))}"
+    
+    try:
+        product_id = int(row['id']) if 'id' in row else None
+        price = float(row['price']) if 'price' in row else None
+        quantity = int(row['quantity']) if 'quantity' in row else None
+        category_id = int(row['category_id']) if 'category_id' in row else None
+    except (TypeError, ValueError):
+        return None, "Поля id, price, quantity та category_id мають бути числами"
+    
+    if price is not None and price < 0 or quantity is not None and quantity < 0:
+        return None, "Ціна та кількість не можуть бути від'ємними"
+    
+    if category_id is None and 'category' in row:
+        category_id = category_names.get(str(row['category']))
+        if category_id is None:
+            return None, f"Категорія '{row['category']}' не знайдена"
+    elif category_id is not None and category_id not in category_ids:
+        return None, f"Категорія з ID {category_id} не знайдена"
+    
+    return {
+        "id": product_id,
+        "name": str(row['name']) if 'name' in row else None,
+        "description": str(row['description']) if 'description' in row else None,
+        "price": price,
+        "quantity": quantity,
+        "category_id": category_id,
+        "image_url": str(row['image_url']) if 'image_url' in row else None,
+    }, None
+
+# Ендпоінт масового імпорту товарів (для менеджерів). dry_run=1 - лише перевірка
+@app.route('/products/import', methods=['POST'])
+@token_required
+def import_products(current_user):
+    user_id, username, role = current_user
+    
+    if role != 'manager':
+        return jsonify({"success": False, "message": "Тільки менеджери можуть імпортувати товари"}), 403
+    
+    file_format = bulk_format(request.args.get('format') or request.content_type)
+    if not file_format:
+        return jsonify({"success": False, "message": "Підтримуються формати CSV (text/csv) та JSON Lines (application/x-ndjson)"}), 415
+    dry_run = request.args.get('dry_run') in ('1', 'true')
+    
+    try:
+        # Файл читається до з'єднання з базою, щоб не тримати блокування на запис, поки він завантажується
+        rows = list(read_import_rows(request.stream, file_format))
         
-        return jsonify({
-            "success": True, 
-            "message": "Товар успішно додано", 
-            "product_id": product_id
-        }), 201
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Категорії та існуючі товари завантажуються один раз для всього файлу всередині
+            # транзакції запису: товар, доданий чи видалений паралельно, не змінить
+            # розподіл на вставки та оновлення між перевіркою та записом
+            cursor.execute("BEGIN" if dry_run else "BEGIN IMMEDIATE")
+            cursor.execute("SELECT id, name FROM categories")
+            category_names = {name: category_id for category_id, name in cursor.fetchall()}
+            category_ids = set(category_names.values())
+            cursor.execute("SELECT id FROM products")
+            existing_ids = {row[0] for row in cursor.fetchall()}
+            
+            inserts, updates, errors = [], [], []
+            seen_ids = set()
+            error_count = 0
+            for row_number, row, error in rows:
+                values = None
+                if error is None:
+                    values, error = validate_import_row(row, category_ids, category_names)
+                if error is None and values['id'] is not None:
+                    if values['id'] in seen_ids:
+                        error = f"Товар з ID {values['id']} вже є у файлі"
+                    seen_ids.add(values['id'])
+                if error is None and values['id'] not in existing_ids:
+                    missing = [name for name in ("name", "price", "quantity", "category_id") if values[name] is None]
+                    if missing:
+                        error = f"Для нового товару потрібні поля: {', '.join(missing)}"
+                
+                if error is not None:
+                    error_count += 1
+                    if len(errors) < IMPORT_MAX_ERRORS:
+                        errors.append({"row": row_number, "message": error})
+                elif values['id'] in existing_ids:
+                    updates.append(values)
+                else:
+                    inserts.append(values)
+            
+            # Файл з помилками не застосовується навіть частково
+            if error_count:
+                conn.rollback()
+                return jsonify({
+                    "success": False,
+                    "message": f"Рядків з помилками: {error_count}. Товари не змінено",
+                    "dry_run": dry_run,
+                    "inserted": 0,
+                    "updated": 0,
+                    "error_count": error_count,
+                    "errors": errors
+                }), 400
+            
+            if not dry_run and (inserts or updates):
+                # Запис у тій самій транзакції після перевірки всього файлу
+                cursor.executemany("""
+                    INSERT INTO products (id, name, description, price, quantity, category_id, image_url) 
+                    VALUES (:id, :name, COALESCE(:description, ''), :price, :quantity, :category_id, COALESCE(:image_url, ''))
+                """, inserts)
+                cursor.executemany("""
+                    UPDATE products 
+                    SET name = COALESCE(:name, name), description = COALESCE(:description, description),
+                        price = COALESCE(:price, price), quantity = COALESCE(:quantity, quantity),
+                        category_id = COALESCE(:category_id, category_id), image_url = COALESCE(:image_url, image_url)
+                    WHERE id = :id
+                """, updates)
+                conn.commit()
+                
+                response_cache.invalidate('products')
+                response_cache.invalidate('product')
+            else:
+                conn.rollback()
+            
+            return jsonify({
+                "success": True,
+                "dry_run": dry_run,
+                "inserted": len(inserts),
+                "updated": len(updates),
+                "error_count": 0,
+                "errors": []
+            }), 200
+    except sqlite3.IntegrityError as e:
+        return jsonify({"success": False, "message": f"Помилка цілісності даних: {str(e)}"}), 409
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
+# Ендпоінт потокового експорту товарів (для менеджерів): format=csv або jsonl
+@app.route('/products/export', methods=['GET'])
+@token_required
+def export_products(current_user):
+    user_id, username, role = current_user
+    
+    if role != 'manager':
+        return jsonify({"success": False, "message": "Тільки менеджери можуть експортувати товари"}), 403
+    
+    file_format = bulk_format(request.args.get('format', 'csv'))
+    if not file_format:
+        return jsonify({"success": False, "message": "Підтримуються формати csv та jsonl"}), 400
+    
+    # Рядки читаються та відправляються частинами, з'єднання з базою тримається до кінця відповіді
+    def generate():
+        with get_db() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT p.id, p.name, p.description, p.price, p.quantity, p.category_id, c.name as category, p.image_url 
+                FROM products p 
+                LEFT JOIN categories c ON p.category_id = c.id 
+                ORDER BY p.id
+            """)
+            
+            if file_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(EXPORT_FIELDS)
+            
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                if file_format == 'csv':
+                    writer.writerows([row[name] for name in EXPORT_FIELDS] for row in rows)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                else:
+                    yield "".join(json.dumps(dict(row), ensure_ascii=False) + "\n" for row in rows)
+    
+    mimetype = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=products.{file_format}"})
+
 @app.route('/products/<int:product_id>', methods=['PUT'])
 @token_required
 def update_product(current_user, product_id):
@@ -607,62 +1392,61 @@ def update_product(current_user, product_id):
     image_url = data.get('image_url')
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка, чи існує товар
-        cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"success": False, "message": "Товар не знайдено"}), 404
-        
-        # Оновлення тільки наданих полів
-        update_fields = []
-        params = []
-        
-        if name is not None:
-            update_fields.append("name = ?")
-            params.append(name)
-        
-        if description is not None:
-            update_fields.append("description = ?")
-            params.append(description)
-        
-        if price is not None:
-            update_fields.append("price = ?")
-            params.append(price)
-        
-        if quantity is not None:
-            update_fields.append("quantity = ?")
-            params.append(quantity)
-        
-        if category_id is not None:
-            # Перевірка, чи існує категорія
-            cursor.execute("SELECT id FROM categories WHERE id = ?", (category_id,))
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Перевірка, чи існує товар
+            cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
             if not cursor.fetchone():
-                conn.close()
-                return jsonify({"success": False, "message": "Категорія не знайдена"}), 404
+                return jsonify({"success": False, "message": "Товар не знайдено"}), 404
             
-            update_fields.append("category_id = ?")
-            params.append(category_id)
-        
-        if image_url is not None:
-            update_fields.append("image_url = ?")
-            params.append(image_url)
-        
-        if not update_fields:
-            conn.close()
-            return jsonify({"success": False, "message": "Немає даних для оновлення"}), 400
-        
-        query = f"UPDATE products SET {', '.join(update_fields)} WHERE id = ?"
-        params.append(product_id)
-        
-        cursor.execute(query, params)
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Товар успішно оновлено"}), 200
+            # Оновлення тільки наданих полів
+            update_fields = []
+            params = []
+            
+            if name is not None:
+                update_fields.append("name = ?")
+                params.append(name)
+            
+            if description is not None:
+                update_fields.append("description = ?")
+                params.append(description)
+            
+            if price is not None:
+                update_fields.append("price = ?")
+                params.append(price)
+            
+            if quantity is not None:
+                update_fields.append("quantity = ?")
+                params.append(quantity)
+            
+            if category_id is not None:
+                # Перевірка, чи існує категорія
+                cursor.execute("SELECT id FROM categories WHERE id = ?", (category_id,))
+                if not cursor.fetchone():
+                    return jsonify({"success": False, "message": "Категорія не знайдена"}), 404
+                
+                update_fields.append("category_id = ?")
+                params.append(category_id)
+            
+            if image_url is not None:
+                update_fields.append("image_url = ?")
+                params.append(image_url)
+            
+            if not update_fields:
+                return jsonify({"success": False, "message": "Немає даних для оновлення"}), 400
+            
+            query = f"UPDATE products SET {', '.join(update_fields)} WHERE id = ?"
+            params.append(product_id)
+            
+            cursor.execute(query, params)
+            
+            conn.commit()
+            
+            response_cache.invalidate('products')
+            response_cache.invalidate('product', product_id)
+            
+            return jsonify({"success": True, "message": "Товар успішно оновлено"}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -675,22 +1459,25 @@ def delete_product(current_user, product_id):
         return jsonify({"success": False, "message": "Тільки менеджери можуть видаляти товари"}), 403
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка, чи існує товар
-        cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"success": False, "message": "Товар не знайдено"}), 404
-        
-        # Видалення товару
-        cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Товар успішно видалено"}), 200
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Перевірка, чи існує товар
+            cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
+            if not cursor.fetchone():
+                return jsonify({"success": False, "message": "Товар не знайдено"}), 404
+            
+            # Видалення товару
+            cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
+            cursor.execute("DELETE FROM product_ratings WHERE product_id = ?", (product_id,))
+            
+            conn.commit()
+            
+            response_cache.invalidate('products')
+            response_cache.invalidate('product', product_id)
+            response_cache.invalidate('reviews', product_id)
+            
+            return jsonify({"success": True, "message": "Товар успішно видалено"}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -711,21 +1498,22 @@ def create_category(current_user):
         return jsonify({"success": False, "message": "Ім'я категорії є обов'язковим"}), 400
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("INSERT INTO categories (name, description) VALUES (?, ?)", (name, description))
-        
-        category_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            "success": True, 
-            "message": "Категорія успішно додана", 
-            "category_id": category_id
-        }), 201
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("INSERT INTO categories (name, description) VALUES (?, ?)", (name, description))
+            
+            category_id = cursor.lastrowid
+            
+            conn.commit()
+            
+            response_cache.invalidate('categories')
+            
+            return jsonify({
+                "success": True, 
+                "message": "Категорія успішно додана", 
+                "category_id": category_id
+            }), 201
     except sqlite3.IntegrityError:
         return jsonify({"success": False, "message": "Категорія з таким ім'ям вже існує"}), 409
     except Exception as e:
@@ -747,36 +1535,39 @@ def update_category(current_user, category_id):
         return jsonify({"success": False, "message": "Немає даних для оновлення"}), 400
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка, чи існує категорія
-        cursor.execute("SELECT id FROM categories WHERE id = ?", (category_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"success": False, "message": "Категорія не знайдена"}), 404
-        
-        # Оновлення полів
-        update_fields = []
-        params = []
-        
-        if name:
-            update_fields.append("name = ?")
-            params.append(name)
-        
-        if description is not None:
-            update_fields.append("description = ?")
-            params.append(description)
-        
-        query = f"UPDATE categories SET {', '.join(update_fields)} WHERE id = ?"
-        params.append(category_id)
-        
-        cursor.execute(query, params)
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Категорія успішно оновлена"}), 200
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Перевірка, чи існує категорія
+            cursor.execute("SELECT id FROM categories WHERE id = ?", (category_id,))
+            if not cursor.fetchone():
+                return jsonify({"success": False, "message": "Категорія не знайдена"}), 404
+            
+            # Оновлення полів
+            update_fields = []
+            params = []
+            
+            if name:
+                update_fields.append("name = ?")
+                params.append(name)
+            
+            if description is not None:
+                update_fields.append("description = ?")
+                params.append(description)
+            
+            query = f"UPDATE categories SET {', '.join(update_fields)} WHERE id = ?"
+            params.append(category_id)
+            
+            cursor.execute(query, params)
+            
+            conn.commit()
+            
+            # Назва категорії входить і до відповідей з товарами
+            response_cache.invalidate('categories')
+            response_cache.invalidate('products')
+            response_cache.invalidate('product')
+            
+            return jsonify({"success": True, "message": "Категорія успішно оновлена"}), 200
     except sqlite3.IntegrityError:
         return jsonify({"success": False, "message": "Категорія з таким ім'ям вже існує"}), 409
     except Exception as e:
@@ -791,30 +1582,29 @@ def delete_category(current_user, category_id):
         return jsonify({"success": False, "message": "Тільки менеджери можуть видаляти категорії"}), 403
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка, чи існує категорія
-        cursor.execute("SELECT id FROM categories WHERE id = ?", (category_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"success": False, "message": "Категорія не знайдена"}), 404
-        
-        # Перевірка, чи є товари в цій категорії
-        cursor.execute("SELECT COUNT(*) FROM products WHERE category_id = ?", (category_id,))
-        products_count = cursor.fetchone()[0]
-        
-        if products_count > 0:
-            conn.close()
-            return jsonify({"success": False, "message": "Неможливо видалити категорію, яка містить товари"}), 400
-        
-        # Видалення категорії
-        cursor.execute("DELETE FROM categories WHERE id = ?", (category_id,))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Категорія успішно видалена"}), 200
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Перевірка, чи існує категорія
+            cursor.execute("SELECT id FROM categories WHERE id = ?", (category_id,))
+            if not cursor.fetchone():
+                return jsonify({"success": False, "message": "Категорія не знайдена"}), 404
+            
+            # Перевірка, чи є товари в цій категорії
+            cursor.execute("SELECT COUNT(*) FROM products WHERE category_id = ?", (category_id,))
+            products_count = cursor.fetchone()[0]
+            
+            if products_count > 0:
+                return jsonify({"success": False, "message": "Неможливо видалити категорію, яка містить товари"}), 400
+            
+            # Видалення категорії
+            cursor.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+            
+            conn.commit()
+            
+            response_cache.invalidate('categories')
+            
+            return jsonify({"success": True, "message": "Категорія успішно видалена"}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -836,38 +1626,133 @@ def update_order_status(current_user, order_id):
         return jsonify({"success": False, "message": f"Недійсний статус. Допустимі значення: {', '.join(valid_statuses)}"}), 400
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка, чи існує замовлення
-        cursor.execute("SELECT id FROM orders WHERE id = ?", (order_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"success": False, "message": "Замовлення не знайдено"}), 404
-        
-        # Оновлення статусу
-        cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (status, order_id))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Статус замовлення успішно оновлено"}), 200
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Перевірка, чи існує замовлення
+            cursor.execute("SELECT status FROM orders WHERE id = ?", (order_id,))
+            order = cursor.fetchone()
+            if not order:
+                conn.rollback()
+                return jsonify({"success": False, "message": "Замовлення не знайдено"}), 404
+            
+            # Оновлення статусу
+            cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (status, order_id))
+            
+            # Скасування прибирає замовлення з підсумків продажів, відновлення - повертає
+            was_cancelled = order[0] == CANCELLED_STATUS
+            if was_cancelled != (status == CANCELLED_STATUS):
+                apply_order_sales(cursor, order_id, 1 if was_cancelled else -1)
+            
+            conn.commit()
+            
+            return jsonify({"success": True, "message": "Статус замовлення успішно оновлено"}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
-# Ендпоінти для чату
-@app.route('/chat/messages', methods=['GET'])
+# Аналітика продажів: період за замовчуванням (днів до сьогодні включно) та кількість найкращих товарів
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_TOP_PRODUCTS = 10
+ANALYTICS_MAX_TOP_PRODUCTS = 100
+
+# Ендпоінт аналітики продажів: виручка, кількість одиниць та замовлень по днях,
+# найкращі товари та категорії за період. Читає лише денні підсумки,
+# тому не залежить від кількості замовлень
+@app.route('/analytics/sales', methods=['GET'])
 @token_required
-def get_chat_messages(current_user):
+def get_sales_analytics(current_user):
     user_id, username, role = current_user
     
+    if role != 'manager':
+        return jsonify({"success": False, "message": "Тільки менеджери можуть переглядати аналітику"}), 403
+    
+    # Період (дати у форматі РРРР-ММ-ДД, обидві межі включно; дати замовлень - за UTC)
     try:
-        conn = sqlite3.connect('robotics_shop.db')
+        date_to = request.args.get('date_to')
+        date_to = datetime.date.fromisoformat(date_to) if date_to else datetime.datetime.utcnow().date()
+        date_from = request.args.get('date_from')
+        date_from = (datetime.date.fromisoformat(date_from) if date_from
+                     else date_to - datetime.timedelta(days=ANALYTICS_DEFAULT_DAYS - 1))
+    except ValueError:
+        return jsonify({"success": False, "message": "Недійсна дата. Очікуваний формат: РРРР-ММ-ДД"}), 400
+    
+    if date_from > date_to:
+        return jsonify({"success": False, "message": "Початкова дата пізніша за кінцеву"}), 400
+    
+    limit = request.args.get('limit', ANALYTICS_TOP_PRODUCTS, type=int)
+    limit = max(1, min(limit, ANALYTICS_MAX_TOP_PRODUCTS))
+    period = (date_from.isoformat(), date_to.isoformat())
+    
+    try:
+        with get_db() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT day, orders_count, units, ROUND(revenue, 2) as revenue
+                FROM sales_daily
+                WHERE day BETWEEN ? AND ? AND orders_count > 0
+                ORDER BY day
+            """, period)
+            daily = [dict(row) for row in cursor.fetchall()]
+            
+            totals = {
+                "orders_count": sum(day["orders_count"] for day in daily),
+                "units": sum(day["units"] for day in daily),
+                "revenue": round(sum(day["revenue"] for day in daily), 2)
+            }
+            
+            cursor.execute("""
+                SELECT s.product_id, p.name, SUM(s.orders_count) as orders_count,
+                       SUM(s.units) as units, ROUND(SUM(s.revenue), 2) as revenue
+                FROM sales_daily_products s
+                LEFT JOIN products p ON p.id = s.product_id
+                WHERE s.day BETWEEN ? AND ?
+                GROUP BY s.product_id
+                HAVING SUM(s.units) > 0
+                ORDER BY revenue DESC, units DESC
+                LIMIT ?
+            """, (*period, limit))
+            top_products = [dict(row) for row in cursor.fetchall()]
+            
+            cursor.execute("""
+                SELECT s.category_id, c.name, SUM(s.units) as units, ROUND(SUM(s.revenue), 2) as revenue
+                FROM sales_daily_products s
+                LEFT JOIN categories c ON c.id = s.category_id
+                WHERE s.day BETWEEN ? AND ?
+                GROUP BY s.category_id
+                HAVING SUM(s.units) > 0
+                ORDER BY revenue DESC
+            """, period)
+            categories = [dict(row) for row in cursor.fetchall()]
+            
+            return jsonify({
+                "success": True,
+                "date_from": period[0],
+                "date_to": period[1],
+                "totals": totals,
+                "daily": daily,
+                "top_products": top_products,
+                "categories": categories
+            }), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
+
+# Ендпоінти для чату
+# Максимальний час довгого опитування чату та інтервал повторної перевірки бази даних
+CHAT_MAX_WAIT = 30
+CHAT_RECHECK_INTERVAL = 5
+
+# Повідомлення розмови клієнта (всі або новіші за since_id) з позначенням
+# прочитаними повідомлень іншої сторони
+def load_chat_messages(conversation_id, role, since_id=None):
+    with get_db() as conn:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        if role == 'client':
-            # Клієнт бачить тільки свої повідомлення
+        if since_id is None:
             cursor.execute("""
                 SELECT cm.*, u.username as user_username, m.username as manager_username 
                 FROM chat_messages cm 
@@ -875,55 +1760,145 @@ def get_chat_messages(current_user):
                 LEFT JOIN users m ON cm.manager_id = m.id 
                 WHERE cm.user_id = ? 
                 ORDER BY cm.timestamp ASC
-            """, (user_id,))
+            """, (conversation_id,))
         else:
-            # Менеджер може бачити повідомлення від певного користувача або всі
-            client_id = request.args.get('client_id')
-            
-            if client_id:
-                cursor.execute("""
-                    SELECT cm.*, u.username as user_username, m.username as manager_username 
-                    FROM chat_messages cm 
-                    LEFT JOIN users u ON cm.user_id = u.id 
-                    LEFT JOIN users m ON cm.manager_id = m.id 
-                    WHERE cm.user_id = ? 
-                    ORDER BY cm.timestamp ASC
-                """, (client_id,))
-            else:
-                # Отримуємо список унікальних клієнтів з повідомленнями
-                cursor.execute("""
-                    SELECT DISTINCT cm.user_id, u.username 
-                    FROM chat_messages cm 
-                    JOIN users u ON cm.user_id = u.id 
-                    ORDER BY u.username
-                """)
-                clients = [dict(row) for row in cursor.fetchall()]
-                
-                return jsonify({"success": True, "clients": clients}), 200
+            cursor.execute("""
+                SELECT cm.*, u.username as user_username, m.username as manager_username 
+                FROM chat_messages cm 
+                LEFT JOIN users u ON cm.user_id = u.id 
+                LEFT JOIN users m ON cm.manager_id = m.id 
+                WHERE cm.user_id = ? AND cm.id > ? 
+                ORDER BY cm.id ASC
+            """, (conversation_id, since_id))
         
         messages = [dict(row) for row in cursor.fetchall()]
         
         # Позначаємо повідомлення як прочитані
-        if messages and role == 'manager':
-            client_id = request.args.get('client_id')
-            if client_id:
-                cursor.execute("""
-                    UPDATE chat_messages 
-                    SET is_read = 1 
-                    WHERE user_id = ? AND sender_role = 'client' AND is_read = 0
-                """, (client_id,))
-                conn.commit()
-        elif messages and role == 'client':
+        if messages:
+            other_role = 'client' if role == 'manager' else 'manager'
             cursor.execute("""
                 UPDATE chat_messages 
                 SET is_read = 1 
-                WHERE user_id = ? AND sender_role = 'manager' AND is_read = 0
-            """, (user_id,))
+                WHERE user_id = ? AND sender_role = ? AND is_read = 0
+            """, (conversation_id, other_role))
             conn.commit()
         
-        conn.close()
-        
-        return jsonify({"success": True, "messages": messages}), 200
+        return messages
+
+# Ендпоінт для отримання повідомлень чату.
+# since_id - лише повідомлення з більшим id; wait - скільки секунд чекати
+# нових повідомлень, якщо їх ще немає (довге опитування)
+@app.route('/chat/messages', methods=['GET'])
+@token_required
+def get_chat_messages(current_user):
+    user_id, username, role = current_user
+    
+    since_id = request.args.get('since_id', type=int)
+    wait = min(max(request.args.get('wait', 0, type=float), 0), CHAT_MAX_WAIT)
+    
+    try:
+        if role == 'client':
+            # Клієнт бачить тільки свої повідомлення
+            conversation_id = user_id
+        else:
+            # Менеджер може бачити повідомлення від певного користувача або всі
+            conversation_id = request.args.get('client_id', type=int)
+            
+            if not conversation_id:
+                with get_db() as conn:
+                    conn.row_factory = sqlite3.Row
+                    cursor = conn.cursor()
+                    
+                    # Отримуємо список унікальних клієнтів з повідомленнями
+                    cursor.execute("""
+                        SELECT DISTINCT cm.user_id, u.username 
+                        FROM chat_messages cm 
+                        JOIN users u ON cm.user_id = u.id 
+                        ORDER BY u.username
+                    """)
+                    clients = [dict(row) for row in cursor.fetchall()]
+                    
+                    return jsonify({"success": True, "clients": clients}), 200
+        
+        messages = load_chat_messages(conversation_id, role, since_id)
+        
+        # Очікування без з'єднання з базою даних: сповіщення від send_chat_message
+        # або повторна перевірка через CHAT_RECHECK_INTERVAL
+        deadline = time.monotonic() + wait
+        while not messages and since_id is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            chat_notifier.wait(conversation_id, since_id, min(remaining, CHAT_RECHECK_INTERVAL))
+            messages = load_chat_messages(conversation_id, role, since_id)
+        
+        last_id = max(message['id'] for message in messages) if messages else since_id
+        
+        return jsonify({"success": True, "messages": messages, "last_id": last_id}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
+
+# Розмір сторінки скриньки менеджера за замовчуванням та максимальний, довжина прев'ю
+INBOX_PAGE_SIZE = 20
+INBOX_MAX_PAGE_SIZE = 100
+INBOX_PREVIEW_LENGTH = 100
+
+# Скринька менеджера: розмови з клієнтами від найновішої, для кожної - останнє
+# повідомлення та кількість непрочитаних повідомлень клієнта, одним згрупованим запитом
+@app.route('/chat/inbox', methods=['GET'])
+@token_required
+def get_chat_inbox(current_user):
+    user_id, username, role = current_user
+    
+    if role != 'manager':
+        return jsonify({"success": False, "message": "Тільки менеджери можуть переглядати скриньку чатів"}), 403
+    
+    limit = request.args.get('limit', INBOX_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, INBOX_MAX_PAGE_SIZE))
+    page_cursor = request.args.get('cursor')
+    
+    try:
+        with get_db() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            # Стовпці без агрегатної функції SQLite бере з рядка, де досягнуто MAX(cm.id),
+            # тобто з останнього повідомлення розмови
+            query = """
+                SELECT * FROM (
+                    SELECT cm.user_id, u.username, MAX(cm.id) as last_message_id,
+                           cm.timestamp as last_timestamp, cm.sender_role as last_sender_role,
+                           substr(cm.message, 1, ?) as last_message,
+                           SUM(cm.sender_role = 'client' AND cm.is_read = 0) as unread_count
+                    FROM chat_messages cm 
+                    JOIN users u ON cm.user_id = u.id 
+                    GROUP BY cm.user_id
+                )
+            """
+            params = [INBOX_PREVIEW_LENGTH]
+            
+            # Keyset-пагінація від розмов з найновішими повідомленнями
+            if page_cursor:
+                position = decode_cursor(page_cursor, 'last_message_id', 'desc')
+                if position is None:
+                    return jsonify({"success": False, "message": "Недійсний курсор"}), 400
+                
+                query += " WHERE (last_message_id, user_id) < (?, ?)"
+                params.extend(position)
+            
+            query += " ORDER BY last_message_id DESC, user_id DESC LIMIT ?"
+            params.append(limit + 1)
+            cursor.execute(query, params)
+            
+            conversations = [dict(row) for row in cursor.fetchall()]
+            
+            next_cursor = None
+            if len(conversations) > limit:
+                conversations = conversations[:limit]
+                last = conversations[-1]
+                next_cursor = encode_cursor('last_message_id', 'desc', {"last_message_id": last['last_message_id'], "id": last['user_id']})
+            
+            return jsonify({"success": True, "conversations": conversations, "next_cursor": next_cursor}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -939,38 +1914,41 @@ def send_chat_message(current_user):
         return jsonify({"success": False, "message": "Повідомлення не може бути порожнім"}), 400
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        if role == 'client':
-            # Клієнт відправляє повідомлення
-            cursor.execute("""
-                INSERT INTO chat_messages (user_id, sender_role, message) 
-                VALUES (?, ?, ?)
-            """, (user_id, 'client', message))
-        else:
-            # Менеджер відправляє повідомлення клієнту
-            client_id = data.get('client_id')
+        with get_db() as conn:
+            cursor = conn.cursor()
             
-            if not client_id:
-                conn.close()
-                return jsonify({"success": False, "message": "ID клієнта не вказано"}), 400
+            if role == 'client':
+                # Клієнт відправляє повідомлення
+                conversation_id = user_id
+                cursor.execute("""
+                    INSERT INTO chat_messages (user_id, sender_role, message) 
+                    VALUES (?, ?, ?)
+                """, (user_id, 'client', message))
+            else:
+                # Менеджер відправляє повідомлення клієнту
+                client_id = data.get('client_id')
+                
+                if not client_id:
+                    return jsonify({"success": False, "message": "ID клієнта не вказано"}), 400
+                
+                # Перевірка, чи існує користувач
+                cursor.execute("SELECT id FROM users WHERE id = ? AND role = 'client'", (client_id,))
+                if not cursor.fetchone():
+                    return jsonify({"success": False, "message": "Клієнт не знайдений"}), 404
+                
+                conversation_id = int(client_id)
+                cursor.execute("""
+                    INSERT INTO chat_messages (user_id, manager_id, sender_role, message) 
+                    VALUES (?, ?, ?, ?)
+                """, (client_id, user_id, 'manager', message))
             
-            # Перевірка, чи існує користувач
-            cursor.execute("SELECT id FROM users WHERE id = ? AND role = 'client'", (client_id,))
-            if not cursor.fetchone():
-                conn.close()
-                return jsonify({"success": False, "message": "Клієнт не знайдений"}), 404
+            message_id = cursor.lastrowid
+            conn.commit()
             
-            cursor.execute("""
-                INSERT INTO chat_messages (user_id, manager_id, sender_role, message) 
-                VALUES (?, ?, ?, ?)
-            """, (client_id, user_id, 'manager', message))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Повідомлення успішно відправлено"}), 201
+            # Пробудження довгих опитувань цієї розмови
+            chat_notifier.publish(conversation_id, message_id)
+            
+            return jsonify({"success": True, "message": "Повідомлення успішно відправлено", "message_id": message_id}), 201
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -987,61 +1965,63 @@ def update_profile(current_user):
     new_password = data.get('new_password')
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        update_fields = []
-        params = []
-        
-        # Оновлення імені користувача
-        if new_username and new_username != username:
-            # Перевірка чи ім'я не зайняте
-            cursor.execute("SELECT id FROM users WHERE username = ? AND id != ?", (new_username, user_id))
-            if cursor.fetchone():
-                conn.close()
-                return jsonify({"success": False, "message": "Це ім'я користувача вже використовується"}), 409
-            
-            update_fields.append("username = ?")
-            params.append(new_username)
-        
-        # Оновлення email
-        if email:
-            # Перевірка чи email не зайнятий
-            cursor.execute("SELECT id FROM users WHERE email = ? AND id != ?", (email, user_id))
-            if cursor.fetchone():
-                conn.close()
-                return jsonify({"success": False, "message": "Цей email вже використовується"}), 409
-            
-            update_fields.append("email = ?")
-            params.append(email)
-        
-        # Зміна пароля
-        if current_password and new_password:
-            hashed_current = hash_password(current_password)
+        with get_db() as conn:
+            cursor = conn.cursor()
             
-            # Перевірка поточного пароля
-            cursor.execute("SELECT id FROM users WHERE id = ? AND password = ?", (user_id, hashed_current))
-            if not cursor.fetchone():
-                conn.close()
-                return jsonify({"success": False, "message": "Неправильний поточний пароль"}), 401
+            update_fields = []
+            params = []
             
-            hashed_new = hash_password(new_password)
-            update_fields.append("password = ?")
-            params.append(hashed_new)
-        
-        if not update_fields:
-            conn.close()
-            return jsonify({"success": False, "message": "Немає даних для оновлення"}), 400
-        
-        query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = ?"
-        params.append(user_id)
-        
-        cursor.execute(query, params)
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Профіль успішно оновлено"}), 200
+            # Оновлення імені користувача
+            if new_username and new_username != username:
+                # Перевірка чи ім'я не зайняте
+                cursor.execute("SELECT id FROM users WHERE username = ? AND id != ?", (new_username, user_id))
+                if cursor.fetchone():
+                    return jsonify({"success": False, "message": "Це ім'я користувача вже використовується"}), 409
+                
+                update_fields.append("username = ?")
+                params.append(new_username)
+            
+            # Оновлення email
+            if email:
+                # Перевірка чи email не зайнятий
+                cursor.execute("SELECT id FROM users WHERE email = ? AND id != ?", (email, user_id))
+                if cursor.fetchone():
+                    return jsonify({"success": False, "message": "Цей email вже використовується"}), 409
+                
+                update_fields.append("email = ?")
+                params.append(email)
+            
+            # Зміна пароля
+            if current_password and new_password:
+                hashed_current = hash_password(current_password)
+                
+                # Перевірка поточного пароля
+                cursor.execute("SELECT id FROM users WHERE id = ? AND password = ?", (user_id, hashed_current))
+                if not cursor.fetchone():
+                    return jsonify({"success": False, "message": "Неправильний поточний пароль"}), 401
+                
+                hashed_new = hash_password(new_password)
+                update_fields.append("password = ?")
+                params.append(hashed_new)
+            
+            if not update_fields:
+                return jsonify({"success": False, "message": "Немає даних для оновлення"}), 400
+            
+            query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = ?"
+            params.append(user_id)
+            
+            cursor.execute(query, params)
+            
+            conn.commit()
+            
+            principal_cache.invalidate('user', user_id)
+            
+            # Ім'я користувача показується у відгуках на сторінці товару
+            if new_username and new_username != username:
+                response_cache.invalidate('product')
+                response_cache.invalidate('reviews')
+            
+            return jsonify({"success": True, "message": "Профіль успішно оновлено"}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
@@ -1055,31 +2035,70 @@ def delete_user(current_user, target_user_id):
         return jsonify({"success": False, "message": "Тільки менеджери можуть видаляти користувачів"}), 403
     
     try:
-        conn = sqlite3.connect('robotics_shop.db')
-        cursor = conn.cursor()
-        
-        # Перевірка, чи існує користувач
-        cursor.execute("SELECT role FROM users WHERE id = ?", (target_user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data:
-            conn.close()
-            return jsonify({"success": False, "message": "Користувач не знайдений"}), 404
-        
-        # Перевірка, чи користувач не є менеджером
-        if user_data[0] == 'manager':
-            conn.close()
-            return jsonify({"success": False, "message": "Неможливо видалити менеджера"}), 403
-        
-        # Видалення користувача
-        cursor.execute("DELETE FROM users WHERE id = ?", (target_user_id,))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({"success": True, "message": "Користувач успішно видалений"}), 200
+        with get_db() as conn:
+            cursor = conn.cursor()
+            
+            # Перевірка, чи існує користувач
+            cursor.execute("SELECT role FROM users WHERE id = ?", (target_user_id,))
+            user_data = cursor.fetchone()
+            
+            if not user_data:
+                return jsonify({"success": False, "message": "Користувач не знайдений"}), 404
+            
+            # Перевірка, чи користувач не є менеджером
+            if user_data[0] == 'manager':
+                return jsonify({"success": False, "message": "Неможливо видалити менеджера"}), 403
+            
+            # Видалення відгуків користувача з перерахунком рейтингів товарів
+            cursor.execute("SELECT product_id, rating FROM reviews WHERE user_id = ?", (target_user_id,))
+            reviewed_products = cursor.fetchall()
+            for review_product_id, review_rating in reviewed_products:
+                apply_review_rating(cursor, review_product_id, old_rating=review_rating)
+            cursor.execute("DELETE FROM reviews WHERE user_id = ?", (target_user_id,))
+            
+            # Видалення користувача
+            cursor.execute("DELETE FROM users WHERE id = ?", (target_user_id,))
+            
+            conn.commit()
+            
+            principal_cache.invalidate('user', target_user_id)
+            
+            if reviewed_products:
+                response_cache.invalidate('products')
+                response_cache.invalidate('product', *(review_product_id for review_product_id, _ in reviewed_products))
+                response_cache.invalidate('reviews', *(review_product_id for review_product_id, _ in reviewed_products))
+            
+            return jsonify({"success": True, "message": "Користувач успішно видалений"}), 200
     except Exception as e:
         return jsonify({"success": False, "message": f"Помилка: {str(e)}"}), 500
 
+# Ендпоінт для метрик сервера (для менеджерів)
+@app.route('/metrics', methods=['GET'])
+@token_required
+def get_metrics(current_user):
+    user_id, username, role = current_user
+
+    if role != 'manager':
+        return jsonify({"success": False, "message": "Тільки менеджери можуть переглядати метрики"}), 403
+
+    return jsonify({"success": True, "db_pool": pool.stats(), "response_cache": response_cache.stats(),
+                    "principal_cache": principal_cache.stats()}), 200
+
+# Команда для повного перерахунку зведених рейтингів: flask --app server rebuild-ratings
+@app.cli.command('rebuild-ratings')
+def rebuild_ratings_command():
+    with get_db() as conn:
+        products_count = rebuild_product_ratings(conn)
+        conn.commit()
+    print(f"Перераховано рейтинги для {products_count} товарів")
+
+# Команда для повного перерахунку денних підсумків продажів: flask --app server rebuild-sales
+@app.cli.command('rebuild-sales')
+def rebuild_sales_command():
+    with get_db() as conn:
+        days_count = rebuild_sales_rollup(conn)
+        conn.commit()
+    print(f"Перераховано підсумки продажів за {days_count} днів")
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,62 @@
+﻿# tests/test_pagination.py
+# Курсори keyset-пагінації: змінений клієнтом курсор відхиляється з 400, а не 500.
+#   python -m unittest discover tests
+import base64
+import json
+import unittest
+
+import db
+from benchmarks.common import fresh_database, populate_catalog
+
+
+def tamper(value, sort_by='name', sort_order='asc', last_id=1):
+    payload = json.dumps([sort_by, sort_order, value, last_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+class CursorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        fresh_database('pagination.db')
+        with db.get_db() as conn:
+            populate_catalog(conn, 30)
+
+        import server
+        server.app.config['TESTING'] = True
+        cls.server = server
+        cls.client = server.app.test_client()
+
+    def setUp(self):
+        self.server.response_cache.clear()
+
+    def get_products(self, cursor=None):
+        query = {'sort_by': 'name', 'sort_order': 'asc', 'limit': 10}
+        if cursor is not None:
+            query['cursor'] = cursor
+        return self.client.get('/products', query_string=query)
+
+    def test_next_cursor_continues_page(self):
+        first = self.get_products().get_json()
+        second = self.get_products(first['next_cursor']).get_json()
+        self.assertEqual(len(second['products']), 10)
+        self.assertLess(first['products'][-1]['name'], second['products'][0]['name'])
+
+    def test_tampered_cursor_value(self):
+        for value in ([1, 2], {'a': 1}, True):
+            with self.subTest(value=value):
+                response = self.get_products(tamper(value))
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.get_json()['success'])
+
+    def test_tampered_cursor_id(self):
+        for last_id in ('1', 1.5, None, True):
+            with self.subTest(last_id=last_id):
+                self.assertEqual(self.get_products(tamper('Товар 1', last_id=last_id)).status_code, 400)
+
+    def test_malformed_cursor(self):
+        self.assertEqual(self.get_products('not-a-cursor').status_code, 400)
+        self.assertEqual(self.get_products(tamper('Товар 1', sort_by='price')).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
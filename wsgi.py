@@ -0,0 +1,44 @@
+﻿# wsgi.py
+# Робочий режим сервера (замість app.run з режимом налагодження).
+#   python wsgi.py                     - waitress: один процес з пулом потоків (Windows та Linux)
+#   gunicorn -c gunicorn.conf.py wsgi:app - gunicorn: кілька процесів з потоками (Linux)
+import os
+import signal
+
+# Робочий профіль зберігання (WAL, більший кеш, mmap), якщо не вибрано інший
+os.environ.setdefault('ROBOTICS_SHOP_STORAGE_PROFILE', 'production')
+
+from server import app
+from db import pool
+
+# Налаштування робочого режиму (можна перевизначити змінними оточення)
+HOST = os.environ.get('ROBOTICS_SHOP_HOST', '127.0.0.1')
+PORT = int(os.environ.get('ROBOTICS_SHOP_PORT', '5000'))
+WORKERS = int(os.environ.get('ROBOTICS_SHOP_WORKERS', '2'))
+THREADS = int(os.environ.get('ROBOTICS_SHOP_THREADS', '8'))
+SHUTDOWN_TIMEOUT = float(os.environ.get('ROBOTICS_SHOP_SHUTDOWN_TIMEOUT', '30'))
+
+
+def serve():
+    from waitress import create_server
+
+    server = create_server(app, host=HOST, port=PORT, threads=THREADS)
+
+    # Коректна зупинка: нові запити не приймаються, поточні завершуються
+    # протягом SHUTDOWN_TIMEOUT секунд, після чого закриваються з'єднання з базою даних
+    def stop(signum, frame):
+        server.task_dispatcher.shutdown(timeout=SHUTDOWN_TIMEOUT)
+        raise SystemExit
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"Сервер працює на http://{HOST}:{PORT} (потоків: {THREADS})")
+    try:
+        server.run()
+    finally:
+        pool.close_all()
+
+
+if __name__ == '__main__':
+    serve()